@@ -0,0 +1,142 @@
+"""
+Building and evaluating the flat cost program against a tree of states.
+
+The tree engine mirrors how plans used to be kept, a `State` object with
+its own lists per selection, evaluated recursively. Both engines consume
+the same stream of enter/leave events for a document of `width` list
+fields sized by a variable, so nothing below them can be folded. Building
+is done once per document, evaluation on every request.
+Run with `python -m benchmarks.cost_program`.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import functools
+import timeit
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from strawberry_query_complexity import Cost, ListCost
+from strawberry_query_complexity._directives import AnyCostDirective
+from strawberry_query_complexity._validation import (
+    CostProgram,
+    CostProgramBuilder,
+    Variable,
+    _get_list_size,
+    get_own_cost,
+)
+
+WIDTHS = (10, 100, 1000, 10_000)
+NUMBER = 20
+CEILING = 2**63 - 1
+VARIABLES = {"first": 20}
+
+_Event = tuple[AnyCostDirective, Sequence[int | Variable]] | None
+
+
+@dataclasses.dataclass(kw_only=True, slots=True)
+class State:
+    directive: AnyCostDirective | None = None
+    complexity: int = 0
+    multipliers: list[int | Variable] = dataclasses.field(default_factory=list)
+    children: list[State] = dataclasses.field(default_factory=list)
+
+
+def make_events(width: int) -> list[_Event]:
+    items = ListCost(assumed_size=10, arguments=["first"])
+    events: list[_Event] = []
+    for _ in range(width):
+        events.append((items, [Variable("first")]))
+        events.append((Cost(complexity=1), []))
+        events.append(None)
+        events.append((items, [Variable("first")]))
+        events.append((Cost(complexity=2), []))
+        events.append(None)
+        events.append(None)
+        events.append(None)
+    return events
+
+
+def _resolve(state: State, variables: Mapping[str, Any]) -> int:
+    children = min(
+        state.complexity
+        + sum(_resolve(child, variables) for child in state.children),
+        CEILING,
+    )
+    if isinstance(state.directive, ListCost):
+        size = _get_list_size(
+            state.directive,
+            state.multipliers,
+            variables,
+            CEILING,
+        )
+        return min(children * size, CEILING)
+    return min(get_own_cost(state.directive, 0) + children, CEILING)
+
+
+def build_tree(events: Sequence[_Event]) -> State:
+    stack = [State()]
+    for event in events:
+        if event is not None:
+            directive, multipliers = event
+            stack.append(State(directive=directive, multipliers=[*multipliers]))
+            continue
+
+        state = stack.pop()
+        if state.children or state.multipliers:
+            stack[-1].children.append(state)
+        else:
+            stack[-1].complexity += _resolve(state, {})
+    return stack[0]
+
+
+def build_program(events: Sequence[_Event]) -> CostProgram:
+    builder = CostProgramBuilder(default_cost=0, ceiling=CEILING)
+    builder.enter_operation()
+    for event in events:
+        if event is not None:
+            builder.enter_field(*event, item_cost=0)
+        else:
+            builder.leave_field()
+    builder.leave_operation()
+    return builder.build(fragment_order=[])
+
+
+def _report(width: int, name: str, seconds: float) -> None:
+    print(  # noqa: T201
+        f"width={width:<6} {name:<18} {seconds / NUMBER * 1000:8.3f} ms/op",
+    )
+
+
+def main() -> None:
+    for width in WIDTHS:
+        events = make_events(width)
+        tree = build_tree(events)
+        program = build_program(events)
+        assert _resolve(tree, VARIABLES) == program.evaluate(  # noqa: S101
+            0,
+            VARIABLES,
+        )
+
+        for name, build in (("tree", build_tree), ("program", build_program)):
+            seconds = timeit.timeit(
+                functools.partial(build, events),
+                number=NUMBER,
+            )
+            _report(width, f"{name} build", seconds)
+
+        seconds = timeit.timeit(
+            functools.partial(_resolve, tree, VARIABLES),
+            number=NUMBER,
+        )
+        _report(width, "tree evaluate", seconds)
+        seconds = timeit.timeit(
+            functools.partial(program.evaluate, 0, VARIABLES),
+            number=NUMBER,
+        )
+        _report(width, "program evaluate", seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Validation time of documents whose fragments fan out.
+
+Fragment `F{n}` spreads `F{n + 1}` twice, expanding every spread would
+take `2 ** depth` steps while evaluating each fragment once stays linear.
+Run with `python -m benchmarks.fragment_fan_out`.
+"""
+
+import functools
+import timeit
+
+from strawberry import Schema
+from strawberry_query_complexity import QueryComplexityExtension
+from tests.test_complexity import Magazine, Query
+
+DEPTHS = (2, 4, 8, 16, 32, 64)
+NUMBER = 50
+
+
+def make_document(depth: int) -> str:
+    fragments = [
+        f"fragment F{i} on Book {{ title ...F{i + 1} ...F{i + 1} }}"
+        for i in range(depth)
+    ]
+    fragments.append(f"fragment F{depth} on Book {{ title }}")
+    return "query { books { ...F0 } }\n" + "\n".join(fragments)
+
+
+def main() -> None:
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=2**80,
+                plan_cache_size=0,
+            ),
+        ],
+        types=[Magazine],
+    )
+    for depth in DEPTHS:
+        document = make_document(depth)
+        seconds = timeit.timeit(
+            functools.partial(schema.execute_sync, document),
+            number=NUMBER,
+        )
+        print(  # noqa: T201
+            f"depth={depth:<4} {seconds / NUMBER * 1000:8.3f} ms/op",
+        )
+
+
+if __name__ == "__main__":
+    main()
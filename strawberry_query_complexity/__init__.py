@@ -1,4 +1,36 @@
+from ._adaptive import AdaptiveComplexityLimit
+from ._budget import TokenBucketBudget
+from ._concurrency import (
+    CostConcurrencyExtension,
+    CostSemaphore,
+    FairCostSemaphore,
+)
+from ._deadline import CostDeadlineExtension
 from ._directives import Cost, ListCost
 from ._extension import QueryComplexityExtension
+from ._lease import LeasedBudget, LocalBudgetStore
+from ._ledger import SharedTokenBucketBudget, SQLiteTokenBucketBudget
+from ._registry import TrustedDocuments
+from ._shared import SharedPlanCache
+from ._sizes import ListSizeStats
+from ._sketch import QuantileSketch
 
-__all__ = ["Cost", "ListCost", "QueryComplexityExtension"]
+__all__ = [
+    "AdaptiveComplexityLimit",
+    "Cost",
+    "CostConcurrencyExtension",
+    "CostDeadlineExtension",
+    "CostSemaphore",
+    "FairCostSemaphore",
+    "LeasedBudget",
+    "ListCost",
+    "ListSizeStats",
+    "LocalBudgetStore",
+    "QuantileSketch",
+    "QueryComplexityExtension",
+    "SQLiteTokenBucketBudget",
+    "SharedPlanCache",
+    "SharedTokenBucketBudget",
+    "TokenBucketBudget",
+    "TrustedDocuments",
+]
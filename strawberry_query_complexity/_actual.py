@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import contextvars
+import dataclasses
+import inspect
+import weakref
+from collections.abc import Awaitable, Callable, Sized
+from typing import TYPE_CHECKING
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLAbstractType,
+    GraphQLInterfaceType,
+    GraphQLNamedType,
+    GraphQLObjectType,
+    GraphQLResolveInfo,
+    GraphQLSchema,
+    GraphQLUnionType,
+    InlineFragmentNode,
+    SelectionNode,
+    SelectionSetNode,
+    default_field_resolver,
+    default_type_resolver,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_composite_type,
+    is_list_type,
+)
+from graphql.pyutils import Path
+
+from ._directives import Cost, ListCost, _get_unset_value
+from ._index import CostIndex, get_cost_index
+from ._validation import get_own_cost
+
+if TYPE_CHECKING:
+    from ._sizes import ListSizeStats
+
+# Objects resolved by each composite field, by response path without
+# list indices and concrete type, `None` for objects of any type
+Counts = dict[tuple[tuple[str, ...], str | None], int]
+
+_counts_var: contextvars.ContextVar[Counts | None] = contextvars.ContextVar(
+    "__strawberry__complexity_counts",
+    default=None,
+)
+# List size sketches of the executed operation
+_sizes_var: contextvars.ContextVar[ListSizeStats | None] = (
+    contextvars.ContextVar("__strawberry__complexity_sizes", default=None)
+)
+_instrumented: weakref.WeakSet[GraphQLSchema] = weakref.WeakSet()
+
+
+def _get_path_key(path: Path) -> tuple[str, ...]:
+    keys = []
+    current: Path | None = path
+    while current is not None:
+        if isinstance(current.key, str):
+            keys.append(current.key)
+        current = current.prev
+    keys.reverse()
+    return tuple(keys)
+
+
+def _count(
+    counts: Counts,
+    path: tuple[str, ...],
+    type_name: str | None,
+    objects: int,
+) -> None:
+    key = (path, type_name)
+    counts[key] = counts.get(key, 0) + objects
+
+
+def _get_type_name(
+    value: object,
+    info: GraphQLResolveInfo,
+    abstract_type: GraphQLAbstractType,
+) -> str | None:
+    resolve_type = abstract_type.resolve_type or default_type_resolver
+    type_ = resolve_type(value, info, abstract_type)
+    if inspect.iscoroutine(type_):  # pragma: no cover
+        # Types resolved asynchronously aren't counted
+        type_.close()
+        return None
+    return type_ if isinstance(type_, str) else None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _CountingResolver:
+    resolve: Callable[..., object]
+    is_list: bool
+    # Field whose list lengths are sketched, if it has `ListCost`
+    sized_field: tuple[str, str] | None
+    # Objects of abstract fields are counted by concrete type too
+    abstract_type: GraphQLAbstractType | None
+
+    def count_objects(self, result: object) -> int:
+        if result is None:
+            return 0
+        if not self.is_list:
+            return 1
+        # Async iterables can't be counted without consuming them
+        return len(result) if isinstance(result, Sized) else 0
+
+    def record(
+        self,
+        result: object,
+        info: GraphQLResolveInfo,
+        counts: Counts | None,
+        sizes: ListSizeStats | None,
+    ) -> None:
+        objects = self.count_objects(result)
+        if counts is not None:
+            path = _get_path_key(info.path)
+            _count(counts, path, None, objects)
+            if self.abstract_type is not None and objects:
+                self.count_types(result, info, counts, path)
+        if sizes is not None and isinstance(result, Sized):
+            sizes.observe(self.sized_field, objects)  # type: ignore[arg-type]
+
+    def count_types(
+        self,
+        result: object,
+        info: GraphQLResolveInfo,
+        counts: Counts,
+        path: tuple[str, ...],
+    ) -> None:
+        assert self.abstract_type is not None  # noqa: S101
+        items = result if self.is_list else [result]
+        types: dict[str, int] = {}
+        for item in items:  # type: ignore[attr-defined]
+            if item is None:
+                continue
+            type_name = _get_type_name(item, info, self.abstract_type)
+            if type_name is None:
+                return
+            types[type_name] = types.get(type_name, 0) + 1
+        for type_name, objects in types.items():
+            _count(counts, path, type_name, objects)
+
+    async def record_awaited(
+        self,
+        result: Awaitable[object],
+        info: GraphQLResolveInfo,
+        counts: Counts | None,
+        sizes: ListSizeStats | None,
+    ) -> object:
+        value = await result
+        self.record(value, info, counts, sizes)
+        return value
+
+    def __call__(
+        self,
+        root: object,
+        info: GraphQLResolveInfo,
+        **args: object,
+    ) -> object:
+        result = self.resolve(root, info, **args)
+        counts = _counts_var.get()
+        sizes = _sizes_var.get() if self.sized_field is not None else None
+        if counts is None and sizes is None:
+            return result
+        if inspect.isawaitable(result):
+            return self.record_awaited(result, info, counts, sizes)
+        self.record(result, info, counts, sizes)
+        return result
+
+
+def instrument_schema(schema: GraphQLSchema) -> None:
+    """
+    Count objects resolved by composite fields of `schema`.
+
+    Only resolvers of fields returning objects or lists with `ListCost`
+    are wrapped, lengths of the latter are sketched when learning sizes.
+    """
+    if schema in _instrumented:
+        return
+    _instrumented.add(schema)
+
+    index = get_cost_index(schema)
+    for name, type_ in schema.type_map.items():
+        if name.startswith("__") or not isinstance(type_, GraphQLObjectType):
+            continue
+        for field_name, field in type_.fields.items():
+            is_list = is_list_type(get_nullable_type(field.type))
+            sized = is_list and isinstance(
+                index.fields.get((name, field_name)),
+                ListCost,
+            )
+            named_type = get_named_type(field.type)
+            abstract = isinstance(
+                named_type,
+                GraphQLInterfaceType | GraphQLUnionType,
+            )
+            if sized or is_composite_type(named_type):
+                field.resolve = _CountingResolver(
+                    resolve=field.resolve or default_field_resolver,
+                    is_list=is_list,
+                    sized_field=(name, field_name) if sized else None,
+                    abstract_type=named_type if abstract else None,
+                )
+
+
+@dataclasses.dataclass(slots=True, kw_only=True)
+class _ActualCost:
+    schema: GraphQLSchema
+    index: CostIndex
+    fragments: dict[str, FragmentDefinitionNode]
+    counts: Counts
+    default_cost: int
+
+    def selection_set(
+        self,
+        selection_set: SelectionSetNode,
+        parent_type: GraphQLNamedType,
+        path: tuple[str, ...],
+        objects: int,
+    ) -> int:
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost += self.field(selection, parent_type, path, objects)
+                continue
+
+            fragment = self.fragment(selection)
+            if fragment is None:  # pragma: no cover
+                continue
+
+            condition = fragment.type_condition
+            fragment_type, fragment_objects = (
+                self.narrow(parent_type, condition.name.value, path, objects)
+                if condition is not None
+                else (parent_type, objects)
+            )
+            cost += self.selection_set(
+                fragment.selection_set,
+                fragment_type,
+                path,
+                fragment_objects,
+            )
+        return cost
+
+    def fragment(
+        self,
+        selection: SelectionNode,
+    ) -> FragmentDefinitionNode | InlineFragmentNode | None:
+        """Fragment a spread or inline fragment `selection` selects."""
+        if isinstance(selection, FragmentSpreadNode):
+            return self.fragments.get(selection.name.value)
+        return selection if isinstance(selection, InlineFragmentNode) else None
+
+    def narrow(
+        self,
+        parent_type: GraphQLNamedType,
+        condition: str,
+        path: tuple[str, ...],
+        objects: int,
+    ) -> tuple[GraphQLNamedType, int]:
+        """Type of a fragment and how many of the objects it applies to."""
+        condition_type = self.schema.type_map[condition]
+        if not isinstance(parent_type, GraphQLInterfaceType | GraphQLUnionType):
+            return condition_type, objects
+
+        counted = {
+            type_.name: self.counts.get((path, type_.name))
+            for type_ in self.schema.get_possible_types(parent_type)
+        }
+        if all(count is None for count in counted.values()):
+            # Concrete types weren't counted
+            return condition_type, objects
+        possible = (
+            [
+                type_.name
+                for type_ in self.schema.get_possible_types(condition_type)
+            ]
+            if isinstance(
+                condition_type,
+                GraphQLInterfaceType | GraphQLUnionType,
+            )
+            else [condition]
+        )
+        return condition_type, sum(counted.get(name) or 0 for name in possible)
+
+    def field(
+        self,
+        node: FieldNode,
+        parent_type: GraphQLNamedType,
+        path: tuple[str, ...],
+        objects: int,
+    ) -> int:
+        name = node.name.value
+        if name.startswith("__") or not isinstance(
+            parent_type,
+            GraphQLObjectType | GraphQLInterfaceType,
+        ):
+            return 0
+        field = parent_type.fields.get(name)
+        if field is None:  # pragma: no cover
+            return 0
+
+        directive = self.index.fields.get((parent_type.name, name))
+        return_type = get_named_type(field.type)
+        path = (*path, node.alias.value if node.alias else name)
+        # Scalar fields resolve once for each object they're selected on
+        resolved = (
+            self.counts.get((path, None), 0)
+            if node.selection_set is not None
+            else objects
+        )
+
+        if isinstance(directive, ListCost):
+            type_cost = self.index.types.get(return_type.name)
+            item_cost = (
+                _get_unset_value(type_cost.complexity, 0)
+                if isinstance(type_cost, Cost)
+                else 0
+            )
+            cost = item_cost * resolved
+        else:
+            cost = get_own_cost(directive, self.default_cost) * objects
+
+        if node.selection_set is not None and (
+            self.default_cost or return_type.name in self.index.costly_types
+        ):
+            cost += self.selection_set(
+                node.selection_set,
+                return_type,
+                path,
+                resolved,
+            )
+        return cost
+
+
+def get_actual_cost(
+    schema: GraphQLSchema,
+    document: DocumentNode,
+    operation_name: str | None,
+    counts: Counts,
+    default_cost: int,
+) -> int | None:
+    """
+    Cost of an executed operation, counted like its estimate.
+
+    List fields count the objects they resolved instead of their size.
+    """
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:  # pragma: no cover
+        return None
+    root_type = schema.get_root_type(operation.operation)
+    if root_type is None:  # pragma: no cover
+        return None
+
+    actual = _ActualCost(
+        schema=schema,
+        index=get_cost_index(schema),
+        fragments={
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        },
+        counts=counts,
+        default_cost=default_cost,
+    )
+    return default_cost + actual.selection_set(
+        operation.selection_set,
+        root_type,
+        (),
+        1,
+    )
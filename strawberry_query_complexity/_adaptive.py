@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+
+# Load of a resource, 1 when it's saturated
+LoadProbe = Callable[[], float]
+
+
+class AdaptiveComplexityLimit:
+    """
+    Scales max complexity down while the process is overloaded.
+
+    Load is the highest of event loop lag over `max_loop_lag` seconds,
+    operations in flight over `max_in_flight` and `cpu_pressure`, if
+    given. It's checked every `interval` seconds: while over 1 the limit
+    is halved, down to `min_scale` of max complexity, while under
+    `recover_below` it's raised by `recover_step`. In between the limit
+    holds, so it doesn't flap while load is around the threshold.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        min_scale: float = 0.1,
+        max_loop_lag: float = 0.1,
+        max_in_flight: int | None = None,
+        cpu_pressure: LoadProbe | None = None,
+        interval: float = 1.0,
+        recover_below: float = 0.7,
+        recover_step: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 0 < min_scale <= 1:
+            msg = "min_scale must be in (0, 1]"
+            raise ValueError(msg)
+
+        self.min_scale = min_scale
+        self.max_loop_lag = max_loop_lag
+        self.max_in_flight = max_in_flight
+        self.cpu_pressure = cpu_pressure
+        self.interval = interval
+        self.recover_below = recover_below
+        self.recover_step = recover_step
+        self.scale = 1.0
+        self.loop_lag = 0.0
+        self.in_flight = 0
+        self._clock = clock
+        self._checked = clock()
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def load(self) -> float:
+        signals = [self.loop_lag / self.max_loop_lag]
+        if self.max_in_flight is not None:
+            signals.append(self.in_flight / self.max_in_flight)
+        if self.cpu_pressure is not None:
+            signals.append(self.cpu_pressure())
+        return max(signals)
+
+    def get_max_complexity(self, max_complexity: int) -> int:
+        """Max complexity to use for a request now."""
+        now = self._clock()
+        if now - self._checked >= self.interval:
+            self._checked = now
+            self._adjust(self.load())
+            self._measure_loop_lag(now)
+        return int(max_complexity * self.scale)
+
+    def _adjust(self, load: float) -> None:
+        if load > 1:
+            self.scale = max(self.min_scale, self.scale / 2)
+        elif load < self.recover_below:
+            self.scale = min(1.0, self.scale + self.recover_step)
+
+    def _measure_loop_lag(self, now: float) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.call_soon(self._set_loop_lag, now)
+
+    def _set_loop_lag(self, scheduled: float) -> None:
+        self.loop_lag = self._clock() - scheduled
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import dataclasses
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Protocol
+
+
+class CostBudget(Protocol):
+    """Complexity budget of clients, see `TokenBucketBudget`."""
+
+    def charge(self, client: str, cost: int) -> float | None:
+        """
+        Charge `cost` to `client`.
+
+        Return `None` if the client could afford it, otherwise seconds
+        until it can, `math.inf` if it never will.
+        """
+
+
+def _check_bucket_parameters(capacity: int, refill_rate: float) -> None:
+    if capacity <= 0 or refill_rate <= 0:
+        msg = "capacity and refill_rate must be positive"
+        raise ValueError(msg)
+
+
+@dataclasses.dataclass(slots=True)
+class _Bucket:
+    tokens: float
+    updated: float
+
+    def refill(self, now: float, capacity: int, refill_rate: float) -> None:
+        # Clocks of other processes or a previous boot may be ahead
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(capacity, self.tokens + elapsed * refill_rate)
+        self.updated = now
+
+    def take(self, cost: int, refill_rate: float) -> float | None:
+        """Take `cost` tokens, return seconds until there are enough."""
+        if self.tokens < cost:
+            return (cost - self.tokens) / refill_rate
+        self.tokens -= cost
+        return None
+
+
+class TokenBucketBudget:
+    """
+    In-memory token bucket per client.
+
+    Buckets hold up to `capacity` complexity and regain `refill_rate` per
+    second. At most `max_clients` buckets are kept, buckets that have been
+    idle long enough to refill are dropped first since a new bucket
+    starts full anyway, then the least recently charged ones.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int,
+        refill_rate: float,
+        max_clients: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        _check_bucket_parameters(capacity, refill_rate)
+
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_clients = max_clients
+        self._clock = clock
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _is_full(self, bucket: _Bucket, now: float) -> bool:
+        refilled = (now - bucket.updated) * self.refill_rate
+        return bucket.tokens + refilled >= self.capacity
+
+    def charge(self, client: str, cost: int) -> float | None:
+        if cost > self.capacity:
+            return math.inf
+
+        with self._lock:
+            now = self._clock()
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                # Only make room for new clients, evicting the bucket being
+                # charged would hand out a full one
+                self._evict(now)
+                bucket = self._buckets[client] = _Bucket(self.capacity, now)
+            self._buckets.move_to_end(client)
+
+            bucket.refill(now, self.capacity, self.refill_rate)
+            return bucket.take(cost, self.refill_rate)
+
+    def refund(self, client: str, tokens: float) -> None:
+        """Give `tokens` back to `client`."""
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is not None:
+                bucket.tokens = min(self.capacity, bucket.tokens + tokens)
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            client, bucket = next(iter(self._buckets.items()))
+            if len(self._buckets) < self.max_clients and not self._is_full(
+                bucket,
+                now,
+            ):
+                return
+            del self._buckets[client]
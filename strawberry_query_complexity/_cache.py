@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from ._validation import CostProgram
+
+
+@dataclasses.dataclass(slots=True)
+class Flight:
+    """A plan being computed, `program` is set once `done` is."""
+
+    done: threading.Event = dataclasses.field(default_factory=threading.Event)
+    program: CostProgram | None = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent computations of the same plan.
+
+    The first caller to `acquire` a key computes the plan and passes it
+    to `release`, callers acquiring the key in the meantime wait for it
+    for at most `timeout` seconds. `joined` counts callers that waited,
+    `deduplicated` the ones that got a plan from another computation.
+
+    Validation runs synchronously, so only threads can overlap here,
+    asyncio tasks validating on one event loop never do.
+    """
+
+    def __init__(self, timeout: float = 10.0) -> None:
+        self.timeout = timeout
+        self.joined = 0
+        self.deduplicated = 0
+        self._flights: dict[str, Flight] = {}
+        # Abandoned flights are released by finalizers, which the garbage
+        # collector can run on a thread that's already holding the lock
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def acquire(self, key: str) -> tuple[Flight, bool]:
+        """Return the flight of `key` and whether the caller leads it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                return flight, True
+            self.joined += 1
+            return flight, False
+
+    def release(
+        self,
+        key: str,
+        flight: Flight,
+        program: CostProgram | None = None,
+    ) -> None:
+        """Finish `flight`, without a plan if it was abandoned."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not flight.done.is_set():
+                flight.program = program
+                flight.done.set()
+
+    def wait(self, flight: Flight) -> CostProgram | None:
+        flight.done.wait(self.timeout)
+        if flight.program is None:
+            return None
+        with self._lock:
+            self.deduplicated += 1
+        return flight.program
+
+
+class PlanCache(Protocol):
+    """Storage for document cost plans, see `CostPlanCache`."""
+
+    hits: int
+    misses: int
+    flights: SingleFlight
+
+    def __len__(self) -> int: ...
+
+    def get(self, key: str) -> CostProgram | None: ...
+
+    def set(self, key: str, plan: CostProgram) -> None: ...
+
+    def items(self) -> list[tuple[str, CostProgram]]: ...
+
+
+class CostPlanCache:
+    """
+    Bounded LRU cache of document cost plans.
+
+    Keys combine the schema fingerprint with a hash of the document,
+    `hits` and `misses` count lookups since creation. `flights` coalesces
+    concurrent computations of missing plans.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.flights = SingleFlight()
+        self._plans: OrderedDict[str, CostProgram] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, key: str) -> CostProgram | None:
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                self.misses += 1
+                return None
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def set(self, key: str, plan: CostProgram) -> None:
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+
+    def items(self) -> list[tuple[str, CostProgram]]:
+        """Return cached plans, least recently used first."""
+        with self._lock:
+            return list(self._plans.items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+from collections.abc import Sequence
+
+import strawberry
+
+from ._registry import TrustedDocuments
+
+
+def _load_schema(path: str) -> strawberry.Schema:
+    module_name, _, attribute = path.partition(":")
+    schema = getattr(
+        importlib.import_module(module_name),
+        attribute or "schema",
+    )
+    if not isinstance(schema, strawberry.Schema):
+        msg = f"{path} is not a strawberry schema"
+        raise TypeError(msg)
+    return schema
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m strawberry_query_complexity",
+        description="Build a trusted document registry from .graphql files.",
+    )
+    parser.add_argument(
+        "schema",
+        help="schema to cost documents with, as module:attribute",
+    )
+    parser.add_argument(
+        "directory",
+        help="directory searched recursively for .graphql files",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="file to write the registry to",
+    )
+    parser.add_argument(
+        "--app-dir",
+        default=".",
+        help="directory added to the module search path",
+    )
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, args.app_dir)
+    try:
+        schema = _load_schema(args.schema)
+        registry = TrustedDocuments()
+        documents = registry.add_directory(schema, args.directory)
+    except (ImportError, AttributeError, TypeError, ValueError) as e:
+        parser.error(str(e))
+
+    for path, document_id in documents.items():
+        print(f"{document_id}  {path}")  # noqa: T201
+    registry.dump(args.output)
+    return 0
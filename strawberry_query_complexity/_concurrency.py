@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import dataclasses
+from collections.abc import AsyncIterator, Callable
+
+from graphql import ExecutionResult, GraphQLError
+from strawberry.extensions import SchemaExtension
+from strawberry.types import ExecutionContext
+
+from ._context import _complexity_var
+
+
+@dataclasses.dataclass(slots=True, eq=False)
+class _Waiter:
+    cost: int
+    future: asyncio.Future[None]
+    client: str
+
+
+class CostSemaphore:
+    """
+    Semaphore of `capacity` complexity, held by executing operations.
+
+    Operations take their complexity, capped at `capacity` so that any
+    operation can run alone. Operations that don't fit wait in a queue of
+    at most `max_waiting` entries and are admitted in order, cheap
+    operations can't starve expensive ones. Bound to one event loop.
+    """
+
+    def __init__(self, capacity: int, *, max_waiting: int = 1024) -> None:
+        if capacity <= 0:
+            msg = "capacity must be positive"
+            raise ValueError(msg)
+
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self._waiters: collections.deque[_Waiter] = collections.deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(
+        self,
+        cost: int,
+        timeout: float | None = None,
+        client: str = "",
+    ) -> bool:
+        """
+        Take `cost` complexity for `client`, waiting up to `timeout` seconds.
+
+        Return `False` if the queue is full or the wait timed out.
+        """
+        cost = min(cost, self.capacity)
+        if not self.waiting and self.in_flight + cost <= self.capacity:
+            self.in_flight += cost
+            return True
+        if self.waiting >= self.max_waiting:
+            return False
+
+        waiter = _Waiter(
+            cost=cost,
+            future=asyncio.get_running_loop().create_future(),
+            client=client,
+        )
+        self._push(waiter)
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            return False
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return True
+
+    def release(self, cost: int) -> None:
+        self.in_flight -= min(cost, self.capacity)
+        self._wake()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Admitted just as the wait ended
+            self.release(waiter.cost)
+            return
+        self._discard(waiter)
+        self._wake()
+
+    def _wake(self) -> None:
+        while (waiter := self._peek()) is not None:
+            if waiter.future.done():
+                self._discard(waiter)
+                continue
+            if self.in_flight + waiter.cost > self.capacity:
+                return
+            self._pop(waiter)
+            self.in_flight += waiter.cost
+            waiter.future.set_result(None)
+
+    def _push(self, waiter: _Waiter) -> None:
+        self._waiters.append(waiter)
+
+    def _peek(self) -> _Waiter | None:
+        """Waiter to admit next."""
+        return self._waiters[0] if self._waiters else None
+
+    def _pop(self, waiter: _Waiter) -> None:  # noqa: ARG002
+        """Remove `waiter` returned by `_peek` as it's admitted."""
+        self._waiters.popleft()
+
+    def _discard(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+
+class FairCostSemaphore(CostSemaphore):
+    """
+    `CostSemaphore` sharing capacity fairly between clients.
+
+    Waiting operations are queued per client and admitted by deficit
+    round robin, with their complexity as size: clients take turns and
+    each turn adds `quantum` complexity, `capacity` by default, to the
+    complexity a client may be admitted. A client sending expensive
+    operations gets the same share as the others, cheap operations of
+    other clients don't wait behind its queue.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        *,
+        max_waiting: int = 1024,
+        quantum: int | None = None,
+    ) -> None:
+        if quantum is not None and quantum <= 0:
+            msg = "quantum must be positive"
+            raise ValueError(msg)
+
+        super().__init__(capacity, max_waiting=max_waiting)
+        self.quantum = quantum if quantum is not None else capacity
+        self._queues: dict[str, collections.deque[_Waiter]] = {}
+        self._deficits: dict[str, int] = {}
+        # Clients with waiting operations, in turn order
+        self._active: collections.deque[str] = collections.deque()
+        self._count = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._count
+
+    def _push(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.client)
+        if queue is None:
+            queue = self._queues[waiter.client] = collections.deque()
+            self._deficits[waiter.client] = 0
+            self._active.append(waiter.client)
+        queue.append(waiter)
+        self._count += 1
+
+    def _peek(self) -> _Waiter | None:
+        if not self._active:
+            return None
+        while True:
+            client = self._active[0]
+            waiter = self._queues[client][0]
+            if self._deficits[client] >= waiter.cost:
+                return waiter
+            # Next client's turn
+            self._active.rotate(-1)
+            self._deficits[self._active[0]] += self.quantum
+
+    def _pop(self, waiter: _Waiter) -> None:
+        self._deficits[waiter.client] -= waiter.cost
+        self._discard(waiter)
+
+    def _discard(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.client)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._count -= 1
+        if not queue:
+            del self._queues[waiter.client]
+            del self._deficits[waiter.client]
+            self._active.remove(waiter.client)
+
+
+class CostConcurrencyExtension(SchemaExtension):
+    """
+    Limits the complexity of operations executing at once.
+
+    Executions take the complexity computed by `QueryComplexityExtension`
+    from a `CostSemaphore` of `capacity` and give it back once they finish.
+    With `client_key` waiting operations are scheduled fairly between
+    clients by a `FairCostSemaphore`. Operations not admitted within
+    `timeout` seconds, or while `max_waiting` others wait, fail without
+    executing. Requires async execution.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        capacity: int,
+        max_waiting: int = 1024,
+        timeout: float | None = None,
+        client_key: Callable[[ExecutionContext], str | None] | None = None,
+        quantum: int | None = None,
+    ) -> None:
+        self.semaphore = (
+            CostSemaphore(capacity, max_waiting=max_waiting)
+            if client_key is None
+            else FairCostSemaphore(
+                capacity,
+                max_waiting=max_waiting,
+                quantum=quantum,
+            )
+        )
+        self.timeout = timeout
+        self.client_key = client_key
+
+    def _get_client(self, execution_context: ExecutionContext) -> str:
+        if self.client_key is None:
+            return ""
+        return self.client_key(execution_context) or ""
+
+    async def on_execute(self) -> AsyncIterator[None]:
+        # The extension is shared between requests, `execution_context`
+        # is another request's once this one waited
+        execution_context = self.execution_context
+        try:
+            cost = _complexity_var.get().current
+        except LookupError:  # pragma: no cover
+            cost = 0
+
+        if not await self.semaphore.acquire(
+            cost,
+            self.timeout,
+            self._get_client(execution_context),
+        ):
+            execution_context.result = ExecutionResult(
+                data=None,
+                errors=[
+                    GraphQLError(
+                        f"Too many operations are executing to admit complexity of {cost}",
+                        extensions={
+                            "complexity": {
+                                "current": cost,
+                                "inFlight": self.semaphore.in_flight,
+                            },
+                        },
+                    ),
+                ],
+            )
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            self.semaphore.release(cost)
@@ -7,6 +7,9 @@ from contextvars import ContextVar
 class ComplexityResult:
     current: int
     max: int
+    operations: dict[str, int] | None = None
+    # Cost of what execution resolved, if measured
+    actual: int | None = None
 
 
 _complexity_var: ContextVar[ComplexityResult] = contextvars.ContextVar(
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import dataclasses
+import inspect
+import time
+from collections.abc import Awaitable, Callable, Iterator
+
+from graphql import GraphQLError, GraphQLResolveInfo
+from strawberry.extensions import SchemaExtension
+
+from ._context import _complexity_var
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _Deadline:
+    expires: float
+    timeout_ms: float
+
+
+_deadline_var: contextvars.ContextVar[_Deadline | None] = (
+    contextvars.ContextVar("__strawberry__complexity_deadline", default=None)
+)
+
+
+class CostDeadlineExtension(SchemaExtension):
+    """
+    Cancels execution of operations taking longer than their cost allows.
+
+    Operations get `base_ms` plus `ms_per_cost` for each unit of the
+    complexity computed by `QueryComplexityExtension`, at most `max_ms`,
+    or what `model` returns for the complexity if given. Operations with a
+    timeout of zero or less, such as free ones, run without a deadline.
+    Once the deadline passes, pending async resolvers are cancelled and no
+    more resolvers run, their fields resolve to a timeout error and the
+    rest of the result is returned.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_ms: float = 100.0,
+        ms_per_cost: float = 1.0,
+        max_ms: float = 30_000.0,
+        model: Callable[[int], float] | None = None,
+    ) -> None:
+        self.base_ms = base_ms
+        self.ms_per_cost = ms_per_cost
+        self.max_ms = max_ms
+        self.model = model
+
+    def get_timeout_ms(self, complexity: int) -> float:
+        """Time operations of `complexity` may take to execute."""
+        if self.model is not None:
+            return self.model(complexity)
+        return min(self.max_ms, self.base_ms + self.ms_per_cost * complexity)
+
+    def on_execute(self) -> Iterator[None]:
+        try:
+            complexity = _complexity_var.get().current
+        except LookupError:  # pragma: no cover
+            yield
+            return
+
+        timeout_ms = self.get_timeout_ms(complexity)
+        if timeout_ms <= 0:
+            yield
+            return
+
+        _deadline_var.set(
+            _Deadline(
+                expires=time.monotonic() + timeout_ms / 1000,
+                timeout_ms=timeout_ms,
+            ),
+        )
+        try:
+            yield
+        finally:
+            _deadline_var.set(None)
+
+    def resolve(
+        self,
+        _next: Callable[..., object],
+        root: object,
+        info: GraphQLResolveInfo,
+        *args: object,
+        **kwargs: object,
+    ) -> object:
+        deadline = _deadline_var.get()
+        if deadline is None:
+            return _next(root, info, *args, **kwargs)
+
+        remaining = deadline.expires - time.monotonic()
+        if remaining <= 0:
+            raise _timeout_error(deadline)
+        result = _next(root, info, *args, **kwargs)
+        if inspect.isawaitable(result):
+            return _wait(result, deadline)
+        return result
+
+
+async def _wait(result: Awaitable[object], deadline: _Deadline) -> object:
+    remaining = max(deadline.expires - time.monotonic(), 0)
+    try:
+        return await asyncio.wait_for(result, remaining)
+    except asyncio.TimeoutError:
+        raise _timeout_error(deadline) from None
+
+
+def _timeout_error(deadline: _Deadline) -> GraphQLError:
+    return GraphQLError(
+        f"Execution deadline of {deadline.timeout_ms:g} ms was exceeded",
+        extensions={"complexity": {"deadlineMs": deadline.timeout_ms}},
+    )
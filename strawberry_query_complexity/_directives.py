@@ -1,3 +1,5 @@
+from typing import TypeVar
+
 import strawberry
 from strawberry.schema_directive import Location
 
@@ -18,6 +20,25 @@ class ListCost:
     assumed_size: int | None = strawberry.UNSET
     arguments: list[str] | None = strawberry.UNSET
     sized_fields: list[str] | None = strawberry.UNSET
+    max_size: int | None = strawberry.UNSET
 
 
 AnyCostDirective = Cost | ListCost
+
+T = TypeVar("T")
+
+
+def _get_unset_value(value: T | None, default: T) -> T:
+    if value is None or value is strawberry.UNSET:
+        return default
+    return value
+
+
+def default_cost_compare_key(directive: AnyCostDirective | None) -> int:
+    if directive is None:
+        return -1
+
+    if isinstance(directive, ListCost):
+        return _get_unset_value(directive.assumed_size, 0)
+
+    return _get_unset_value(directive.complexity, 0)
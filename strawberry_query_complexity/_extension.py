@@ -1,15 +1,33 @@
 import dataclasses
+import os
 from collections.abc import Callable, Iterator
 from typing import Any
 
+import strawberry
 from strawberry.extensions import SchemaExtension
+from strawberry.types import ExecutionContext
 
-from ._context import _complexity_var
-from ._directives import AnyCostDirective
-from ._validation import (
-    QueryComplexityValidationRule,
-    default_cost_compare_key,
+from ._actual import (
+    Counts,
+    _counts_var,
+    _sizes_var,
+    get_actual_cost,
+    instrument_schema,
 )
+from ._adaptive import AdaptiveComplexityLimit
+from ._budget import CostBudget
+from ._cache import CostPlanCache, PlanCache
+from ._context import _complexity_var
+from ._directives import AnyCostDirective, default_cost_compare_key
+from ._index import get_cost_index
+from ._lease import LeasedBudget
+from ._persistence import dump_plans, load_plans
+from ._registry import TrustedDocuments
+from ._sizes import ListSizeStats
+from ._validation import QueryComplexityValidationRule, get_plan_key_prefix
+
+# Complexity saturates at this value unless a ceiling is given
+_MACHINE_INT_MAX = 2**63 - 1
 
 
 @dataclasses.dataclass(kw_only=True)
@@ -20,23 +38,150 @@ class QueryComplexityConfig:
 
 
 class QueryComplexityExtension(SchemaExtension):
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         *,
         max_complexity: int,
         default_cost: int = 0,
         report_complexity: bool = False,
+        report_operation_costs: bool = False,
+        report_actual_cost: bool = False,
+        plan_cache_size: int = 1024,
+        plan_cache: PlanCache | None = None,
+        trusted_documents: TrustedDocuments | None = None,
+        budget: CostBudget | None = None,
+        client_key: Callable[[ExecutionContext], str | None] | None = None,
+        complexity_ceiling: int | None = None,
+        adaptive_limit: AdaptiveComplexityLimit | None = None,
+        list_sizes: ListSizeStats | None = None,
     ) -> None:
+        if budget is not None and client_key is None:
+            msg = "client_key is required to charge a budget"
+            raise ValueError(msg)
+        if (
+            isinstance(budget, LeasedBudget)
+            and budget.lease_size < max_complexity
+        ):
+            msg = "lease_size of the budget must be at least max_complexity"
+            raise ValueError(msg)
+        if complexity_ceiling is None:
+            complexity_ceiling = max(_MACHINE_INT_MAX, max_complexity + 1)
+        if complexity_ceiling <= max_complexity:
+            msg = "complexity_ceiling must be greater than max_complexity"
+            raise ValueError(msg)
+
         self.max_complexity = max_complexity
+        self.complexity_ceiling = complexity_ceiling
         self.default_complexity = default_cost
         self.report_complexity = report_complexity
+        self.report_operation_costs = report_operation_costs
+        self.report_actual_cost = report_actual_cost
+        self.plan_cache: PlanCache = (
+            plan_cache
+            if plan_cache is not None
+            else CostPlanCache(maxsize=plan_cache_size)
+        )
+        self.trusted_documents = trusted_documents
+        self.budget = budget
+        self.client_key = client_key
+        self.adaptive_limit = adaptive_limit
+        self.list_sizes = list_sizes
+
+    def get_max_complexity(self) -> int:
+        """Max complexity of a request made now."""
+        if self.adaptive_limit is None:
+            return self.max_complexity
+        return self.adaptive_limit.get_max_complexity(self.max_complexity)
+
+    def get_list_sizes_version(self) -> str | None:
+        """Version of the learned list sizes costs use now, if any."""
+        if self.list_sizes is None:
+            return None
+        learned = self.list_sizes.get_learned_sizes()
+        return learned.version if learned is not None else None
+
+    def dump_plans(self, path: str | os.PathLike[str]) -> int:
+        """Write cached cost plans to `path`, return how many."""
+        return dump_plans(self.plan_cache.items(), path)
+
+    def load_plans(
+        self,
+        path: str | os.PathLike[str],
+        schema: strawberry.Schema,
+    ) -> int:
+        """
+        Add cost plans written by `dump_plans` to the cache.
+
+        Plans computed for another version of `schema` or other cost
+        settings are ignored, return how many plans were loaded.
+        """
+        prefix = get_plan_key_prefix(
+            get_cost_index(schema._schema).fingerprint,  # noqa: SLF001
+            self.default_complexity,
+            self.complexity_ceiling,
+            self.get_list_sizes_version(),
+        )
+        count = 0
+        for key, plan in load_plans(path, prefix):
+            self.plan_cache.set(key, plan)
+            count += 1
+        return count
 
     def on_operation(self) -> Iterator[None]:
         self.execution_context.validation_rules = (
             *self.execution_context.validation_rules,
             QueryComplexityValidationRule,
         )
-        yield
+        if self.adaptive_limit is None:
+            yield
+            return
+
+        self.adaptive_limit.enter()
+        try:
+            yield
+        finally:
+            self.adaptive_limit.leave()
+
+    def on_execute(self) -> Iterator[None]:
+        if not self.report_actual_cost and self.list_sizes is None:
+            yield
+            return
+
+        # The extension is shared between requests, `execution_context`
+        # may be another request's once this one executed
+        execution_context = self.execution_context
+        instrument_schema(execution_context.schema._schema)  # noqa: SLF001
+        counts: Counts | None = {} if self.report_actual_cost else None
+        _counts_var.set(counts)
+        _sizes_var.set(self.list_sizes)
+        try:
+            yield
+        finally:
+            _counts_var.set(None)
+            _sizes_var.set(None)
+        if counts is not None:
+            self._set_actual_cost(execution_context, counts)
+
+    def _set_actual_cost(
+        self,
+        execution_context: ExecutionContext,
+        counts: Counts,
+    ) -> None:
+        document = execution_context.graphql_document
+        try:
+            result = _complexity_var.get()
+        except LookupError:  # pragma: no cover
+            return
+        if document is None:  # pragma: no cover
+            return
+
+        result.actual = get_actual_cost(
+            execution_context.schema._schema,  # noqa: SLF001
+            document,
+            execution_context.operation_name,
+            counts,
+            self.default_complexity,
+        )
 
     def get_results(self) -> dict[str, Any]:
         if not self.report_complexity:
@@ -47,9 +192,12 @@ class QueryComplexityExtension(SchemaExtension):
         except LookupError:  # pragma: no cover
             return {}
 
-        return {
-            "complexity": {
-                "current": result.current,
-                "max": result.max,
-            },
+        complexity: dict[str, Any] = {
+            "current": result.current,
+            "max": result.max,
         }
+        if result.operations is not None:
+            complexity["operations"] = result.operations
+        if result.actual is not None:
+            complexity["actual"] = result.actual
+        return {"complexity": complexity}
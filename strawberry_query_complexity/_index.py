@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import types
+import typing
+import weakref
+from collections import defaultdict
+from collections.abc import Iterable, Mapping, Sequence
+
+from graphql import (
+    GraphQLField,
+    GraphQLInterfaceType,
+    GraphQLNamedType,
+    GraphQLObjectType,
+    GraphQLSchema,
+    GraphQLUnionType,
+    get_named_type,
+    print_schema,
+)
+
+from ._directives import AnyCostDirective, default_cost_compare_key
+
+_COST_DIRECTIVE_TYPES = typing.get_args(AnyCostDirective)
+
+_indexes: weakref.WeakKeyDictionary[GraphQLSchema, CostIndex] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class CostIndex:
+    """
+    Cost directives of a schema, resolved once.
+
+    `fields` is keyed by `(parent type name, field name)` and `types` by
+    type name, only entries that carry a cost directive are present.
+    Interfaces and unions are resolved to the most expensive directive
+    among their possible types.
+
+    `costly_types` holds the types under which a field with a cost directive
+    can be selected, with a default cost of zero anything below any other
+    type is free.
+
+    `fingerprint` identifies the schema together with its cost directives.
+    """
+
+    fields: Mapping[tuple[str, str], AnyCostDirective]
+    types: Mapping[str, AnyCostDirective]
+    costly_types: frozenset[str]
+    fingerprint: str
+
+
+def _find_cost_directive(
+    node: GraphQLField | GraphQLNamedType,
+) -> AnyCostDirective | None:
+    for extension in node.extensions.values():
+        for directive in extension.directives:
+            if isinstance(directive, _COST_DIRECTIVE_TYPES):
+                return directive  # type: ignore[no-any-return]
+    return None
+
+
+def _max_cost(
+    directives: Iterable[AnyCostDirective | None],
+) -> AnyCostDirective | None:
+    return max(directives, key=default_cost_compare_key, default=None)
+
+
+def _add_field_costs(
+    fields: dict[tuple[str, str], AnyCostDirective],
+    type_: GraphQLObjectType | GraphQLInterfaceType,
+    implementations: Sequence[GraphQLObjectType],
+) -> None:
+    for field_name, field in type_.fields.items():
+        if implementations:
+            directive = _max_cost(
+                _find_cost_directive(obj.fields[field_name])
+                for obj in implementations
+            )
+        else:
+            directive = _find_cost_directive(field)
+
+        if directive is not None:
+            fields[type_.name, field_name] = directive
+
+
+def _selected_by(schema: GraphQLSchema) -> defaultdict[str, set[str]]:
+    """Map each type name to the names of types it can be selected under."""
+    selected_by: defaultdict[str, set[str]] = defaultdict(set)
+    for name, type_ in schema.type_map.items():
+        if isinstance(type_, GraphQLObjectType | GraphQLInterfaceType):
+            for field in type_.fields.values():
+                selected_by[get_named_type(field.type).name].add(name)
+        if isinstance(type_, GraphQLInterfaceType | GraphQLUnionType):
+            for obj in schema.get_possible_types(type_):
+                selected_by[obj.name].add(name)
+                # Fragments on the abstract type can be spread inside the object
+                selected_by[name].add(obj.name)
+    return selected_by
+
+
+def _find_costly_types(
+    schema: GraphQLSchema,
+    fields: Mapping[tuple[str, str], AnyCostDirective],
+) -> frozenset[str]:
+    selected_by = _selected_by(schema)
+    costly = {type_name for type_name, _ in fields}
+    pending = list(costly)
+    while pending:
+        for name in selected_by[pending.pop()] - costly:
+            costly.add(name)
+            pending.append(name)
+    return frozenset(costly)
+
+
+def _fingerprint(
+    schema: GraphQLSchema,
+    fields: Mapping[tuple[str, str], AnyCostDirective],
+    types_: Mapping[str, AnyCostDirective],
+) -> str:
+    digest = hashlib.sha256(print_schema(schema).encode())
+    for field_key in sorted(fields):
+        digest.update(repr((field_key, fields[field_key])).encode())
+    for type_name in sorted(types_):
+        digest.update(repr((type_name, types_[type_name])).encode())
+    return digest.hexdigest()
+
+
+def build_cost_index(schema: GraphQLSchema) -> CostIndex:
+    fields: dict[tuple[str, str], AnyCostDirective] = {}
+    types_: dict[str, AnyCostDirective] = {}
+
+    for name, type_ in schema.type_map.items():
+        possible_types: Sequence[GraphQLObjectType] = (
+            schema.get_possible_types(type_)
+            if isinstance(type_, GraphQLInterfaceType | GraphQLUnionType)
+            else ()
+        )
+
+        if possible_types:
+            directive = _max_cost(
+                _find_cost_directive(obj) for obj in possible_types
+            )
+        else:
+            directive = _find_cost_directive(type_)
+        if directive is not None:
+            types_[name] = directive
+
+        if isinstance(type_, GraphQLObjectType | GraphQLInterfaceType):
+            _add_field_costs(fields, type_, possible_types)
+
+    return CostIndex(
+        fields=types.MappingProxyType(fields),
+        types=types.MappingProxyType(types_),
+        costly_types=_find_costly_types(schema, fields),
+        fingerprint=_fingerprint(schema, fields, types_),
+    )
+
+
+def get_cost_index(schema: GraphQLSchema) -> CostIndex:
+    """Return the cost index of `schema`, building it on first use."""
+    index = _indexes.get(schema)
+    if index is None:
+        index = _indexes[schema] = build_cost_index(schema)
+    return index
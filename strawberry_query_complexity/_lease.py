@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Mapping
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from ._budget import TokenBucketBudget
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetStore(Protocol):
+    """Complexity budgets of clients kept outside the process."""
+
+    async def reserve(
+        self,
+        amounts: Mapping[str, int],
+    ) -> Mapping[str, float | None]:
+        """
+        Take `amounts` from the budgets of clients.
+
+        Return `None` for each client that could afford it, otherwise
+        seconds until it can, `math.inf` if it never will.
+        """
+
+    async def refund(self, amounts: Mapping[str, float]) -> None:
+        """Give unspent `amounts` back to clients."""
+
+
+@dataclasses.dataclass(slots=True)
+class _Lease:
+    # Negative while in debt
+    tokens: float = 0.0
+    used: float = 0.0
+    blocked_until: float = 0.0
+    wanted: bool = True
+    reserving: bool = False
+
+
+class LeasedBudget:
+    """
+    Budget kept in a `BudgetStore`, charged from local leases.
+
+    Charges never wait for the store. Clients are leased `lease_size`
+    complexity at a time and charged locally, a client may go up to
+    `lease_size` into debt while its next lease is on the way, later
+    leases pay it off. Leases run low are renewed and unspent complexity
+    of clients idle for `idle_timeout` seconds is returned in batches by
+    `flush`, `run` flushes every `flush_interval` seconds.
+
+    `run` is started on the event loop of the first charge made from
+    one. Charges made without a running loop, like those of
+    `execute_sync`, need `run` to be scheduled on some loop, otherwise no
+    lease is ever renewed. `lease_size` must be at least the max
+    complexity of the extension, larger charges can never be afforded.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        store: BudgetStore,
+        *,
+        lease_size: int,
+        flush_interval: float = 0.1,
+        idle_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if lease_size <= 0:
+            msg = "lease_size must be positive"
+            raise ValueError(msg)
+
+        self.store = store
+        self.lease_size = lease_size
+        self.flush_interval = flush_interval
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._leases: dict[str, _Lease] = {}
+        self._lock = threading.Lock()
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    def charge(self, client: str, cost: int) -> float | None:
+        if cost > self.lease_size:
+            return math.inf
+
+        self._start_flushing()
+        with self._lock:
+            now = self._clock()
+            lease = self._leases.get(client)
+            if lease is None:
+                lease = self._leases[client] = _Lease()
+            lease.used = now
+
+            if now < lease.blocked_until:
+                return lease.blocked_until - now
+            if lease.tokens - cost < -self.lease_size:
+                lease.wanted = True
+                return self.flush_interval
+            lease.tokens -= cost
+            lease.wanted = lease.tokens < self.lease_size / 2
+            return None
+
+    def _start_flushing(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self.run())
+
+    async def flush(self) -> None:
+        """Renew leases running low, refund those of idle clients."""
+        with self._lock:
+            reservations, refunds = self._collect(self._clock())
+
+        results: Mapping[str, float | None] = {}
+        try:
+            if refunds:
+                await self.store.refund(refunds)
+            if reservations:
+                results = await self.store.reserve(reservations)
+        finally:
+            with self._lock:
+                self._grant(reservations, results)
+
+    def _collect(self, now: float) -> tuple[dict[str, int], dict[str, float]]:
+        reservations = {}
+        refunds = {}
+        for client, lease in list(self._leases.items()):
+            if lease.reserving:
+                continue
+            if now - lease.used >= self.idle_timeout and lease.tokens >= 0:
+                refunds[client] = lease.tokens
+                del self._leases[client]
+            elif lease.wanted and now >= lease.blocked_until:
+                lease.reserving = True
+                reservations[client] = self.lease_size
+        return reservations, refunds
+
+    def _grant(
+        self,
+        reservations: Mapping[str, int],
+        results: Mapping[str, float | None],
+    ) -> None:
+        now = self._clock()
+        for client, amount in reservations.items():
+            lease = self._leases[client]
+            lease.reserving = False
+            if client not in results:
+                continue
+            retry_after = results[client]
+            if retry_after is None:
+                lease.tokens += amount
+                lease.wanted = lease.tokens < self.lease_size / 2
+            else:
+                lease.blocked_until = now + retry_after
+
+    async def run(self) -> None:
+        """Flush every `flush_interval` seconds until cancelled."""
+        while True:
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush budget leases")
+            await asyncio.sleep(self.flush_interval)
+
+
+class LocalBudgetStore:
+    """`BudgetStore` kept in a `TokenBucketBudget` of this process."""
+
+    def __init__(self, budget: TokenBucketBudget) -> None:
+        self.budget = budget
+
+    async def reserve(
+        self,
+        amounts: Mapping[str, int],
+    ) -> Mapping[str, float | None]:
+        return {
+            client: self.budget.charge(client, amount)
+            for client, amount in amounts.items()
+        }
+
+    async def refund(self, amounts: Mapping[str, float]) -> None:
+        for client, amount in amounts.items():
+            self.budget.refund(client, amount)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections.abc import Callable, Iterator
+
+from ._budget import _Bucket, _check_bucket_parameters
+from ._mmap import SlotTable
+
+_MAGIC = b"SQCBUDG1"
+# Client digest, tokens, last charge
+_SLOT = struct.Struct("<16sdd")
+
+# Slots a client can be stored in
+_WAYS = 8
+
+
+class SharedTokenBucketBudget:
+    """
+    Token bucket per client shared by the processes of a host.
+
+    Buckets are stored in a memory mapped file at `path` holding a fixed
+    table of `slots` buckets. A client's bucket is one of eight slots
+    starting at its hash, when all of them belong to other clients the
+    least recently charged one is taken over and starts full.
+
+    A charge updates the bucket in place while holding an exclusive
+    `flock` on the file, no other service is involved. `clock` must be
+    the same for all processes, the default is wall clock time.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        path: str | os.PathLike[str],
+        *,
+        capacity: int,
+        refill_rate: float,
+        slots: int = 65536,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        _check_bucket_parameters(capacity, refill_rate)
+        if slots <= 0:
+            msg = "slots must be positive"
+            raise ValueError(msg)
+
+        self._table = SlotTable(
+            path,
+            magic=_MAGIC,
+            slots=slots,
+            slot_size=_SLOT.size,
+            ways=_WAYS,
+            kind="budget file",
+        )
+        self.path = self._table.path
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.slots = slots
+        self._clock = clock
+        self._map = self._table.map
+
+    def close(self) -> None:
+        self._table.close()
+
+    def __len__(self) -> int:
+        return sum(
+            _SLOT.unpack_from(self._map, offset)[2] != 0
+            for offset in self._table.offsets()
+        )
+
+    def _find_slot(self, digest: bytes) -> int:
+        """Slot of `digest`, else the least recently charged candidate."""
+        oldest, oldest_updated = 0, math.inf
+        for offset in self._table.candidates(digest):
+            slot_digest, _, updated = _SLOT.unpack_from(self._map, offset)
+            if slot_digest == digest:
+                return offset
+            if updated < oldest_updated:
+                oldest, oldest_updated = offset, updated
+        return oldest
+
+    def charge(self, client: str, cost: int) -> float | None:
+        if cost > self.capacity:
+            return math.inf
+
+        digest = hashlib.blake2b(client.encode(), digest_size=16).digest()
+        with self._table.write_lock:
+            now = self._clock()
+            offset = self._find_slot(digest)
+            slot_digest, tokens, updated = _SLOT.unpack_from(self._map, offset)
+            bucket = (
+                _Bucket(tokens, updated)
+                if slot_digest == digest
+                else _Bucket(self.capacity, now)
+            )
+            bucket.refill(now, self.capacity, self.refill_rate)
+            retry_after = bucket.take(cost, self.refill_rate)
+            _SLOT.pack_into(
+                self._map,
+                offset,
+                digest,
+                bucket.tokens,
+                bucket.updated,
+            )
+            return retry_after
+
+
+class SQLiteTokenBucketBudget:
+    """
+    Token bucket per client stored in an SQLite database at `path`.
+
+    Portable fallback for `SharedTokenBucketBudget`, slower but without
+    a limit on the number of clients. The database is in WAL mode, a
+    charge is a short write transaction. Buckets idle long enough to be
+    full again are deleted every `cleanup_interval` charges.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        path: str | os.PathLike[str],
+        *,
+        capacity: int,
+        refill_rate: float,
+        cleanup_interval: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        _check_bucket_parameters(capacity, refill_rate)
+
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.cleanup_interval = cleanup_interval
+        self._clock = clock
+        self._charges = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path,
+            timeout=10,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS budget_buckets ("
+            "client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL"
+            ") WITHOUT ROWID",
+        )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT count(*) FROM budget_buckets",
+            ).fetchone()
+        return count  # type: ignore[no-any-return]
+
+    def charge(self, client: str, cost: int) -> float | None:
+        if cost > self.capacity:
+            return math.inf
+
+        with self._lock, self._transaction():
+            now = self._clock()
+            row = self._connection.execute(
+                "SELECT tokens, updated FROM budget_buckets WHERE client = ?",
+                (client,),
+            ).fetchone()
+            bucket = _Bucket(*row) if row else _Bucket(self.capacity, now)
+            bucket.refill(now, self.capacity, self.refill_rate)
+            retry_after = bucket.take(cost, self.refill_rate)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO budget_buckets VALUES (?, ?, ?)",
+                (client, bucket.tokens, bucket.updated),
+            )
+
+            self._charges += 1
+            if self._charges % self.cleanup_interval == 0:
+                self._connection.execute(
+                    "DELETE FROM budget_buckets WHERE updated < ?",
+                    (now - self.capacity / self.refill_rate,),
+                )
+        return retry_after
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+from types import TracebackType
+
+if sys.platform != "win32":
+    import fcntl
+
+# Magic, slot count, slot size, clock
+_HEADER = struct.Struct("<8sIIQ")
+_CLOCK = struct.Struct("<Q")
+_CLOCK_OFFSET = 16
+
+
+class _WriteLock:
+    """Exclusive `flock` on the file, also held against other threads."""
+
+    __slots__ = ("_fd", "_lock")
+
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+        # flock doesn't exclude threads sharing the file descriptor
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> None:
+        self._lock.acquire()
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+class SlotTable:
+    """
+    Table of `slots` slots of `slot_size` bytes in a memory mapped file.
+
+    The file at `path` is shared by the processes of a host, it's created
+    if missing, an existing file must have the same `magic` and layout.
+    Writers hold `write_lock`, a key can be stored in one of `ways` slots
+    starting at its hash.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        path: str | os.PathLike[str],
+        *,
+        magic: bytes,
+        slots: int,
+        slot_size: int,
+        ways: int,
+        kind: str,
+    ) -> None:
+        if sys.platform == "win32":  # pragma: no cover
+            msg = f"Shared {kind}s are not supported on Windows"
+            raise NotImplementedError(msg)
+
+        self.path = Path(path)
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ways = min(ways, slots)
+        self._magic = magic
+        self._kind = kind
+
+        size = _HEADER.size + slots * slot_size
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.write_lock = _WriteLock(self._fd)
+        try:
+            with self.write_lock:
+                self._initialize(size)
+            self.map = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _initialize(self, size: int) -> None:
+        header = _HEADER.pack(self._magic, self.slots, self.slot_size, 0)
+        if os.fstat(self._fd).st_size == 0:
+            os.ftruncate(self._fd, size)
+            os.pwrite(self._fd, header, 0)
+            return
+
+        existing = os.pread(self._fd, _HEADER.size, 0)
+        if (
+            existing[:_CLOCK_OFFSET] != header[:_CLOCK_OFFSET]
+            or os.fstat(self._fd).st_size != size
+        ):
+            msg = f"{self.path} is not a {self._kind} with the same layout"
+            raise ValueError(msg)
+
+    def close(self) -> None:
+        self.map.close()
+        os.close(self._fd)
+
+    def offset(self, slot: int) -> int:
+        return _HEADER.size + slot * self.slot_size
+
+    def offsets(self) -> range:
+        return range(
+            _HEADER.size,
+            _HEADER.size + self.slots * self.slot_size,
+            self.slot_size,
+        )
+
+    def candidates(self, digest: bytes) -> list[int]:
+        """Offsets of the slots a key of `digest` can be stored in."""
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        return [
+            self.offset((start + way) % self.slots) for way in range(self.ways)
+        ]
+
+    def tick(self) -> int:
+        """Advance the clock kept in the header, under `write_lock`."""
+        clock: int = _CLOCK.unpack_from(self.map, _CLOCK_OFFSET)[0]
+        clock += 1
+        _CLOCK.pack_into(self.map, _CLOCK_OFFSET, clock)
+        return clock
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+import struct
+import tempfile
+import zlib
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ._serialization import dump_program, load_program
+
+if TYPE_CHECKING:
+    from ._validation import CostProgram
+
+_MAGIC = b"SQCPLANS"
+_VERSION = 1
+_HEADER = struct.Struct("<8sI")
+_LENGTH = struct.Struct("<I")
+
+
+def dump_plans(
+    plans: Iterable[tuple[str, CostProgram]],
+    path: str | os.PathLike[str],
+) -> int:
+    """
+    Write `plans` to a compressed file at `path`, return how many.
+
+    The file is replaced atomically, readers never see it half written.
+    """
+    records = bytearray()
+    count = 0
+    for key, plan in plans:
+        for part in (key.encode(), dump_program(plan)):
+            records += _LENGTH.pack(len(part))
+            records += part
+        count += 1
+
+    write_atomic(path, _HEADER.pack(_MAGIC, _VERSION) + zlib.compress(records))
+    return count
+
+
+def write_atomic(path: str | os.PathLike[str], data: bytes) -> None:
+    """Replace the file at `path`, readers never see it half written."""
+    path = Path(path)
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        Path(temporary).replace(path)
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
+
+
+def load_plans(
+    path: str | os.PathLike[str],
+    prefix: str,
+) -> Iterator[tuple[str, CostProgram]]:
+    """
+    Read plans written by `dump_plans` whose key starts with `prefix`.
+
+    Raises `ValueError` if the file isn't a plans file of this version,
+    plans that can't be decoded are skipped.
+    """
+    data = Path(path).read_bytes()
+    if data[: _HEADER.size] != _HEADER.pack(_MAGIC, _VERSION):
+        msg = f"{path} is not a cost plans file"
+        raise ValueError(msg)
+    try:
+        records = zlib.decompress(data[_HEADER.size :])
+    except zlib.error as e:
+        msg = f"{path} is corrupted"
+        raise ValueError(msg) from e
+
+    offset = 0
+    while offset < len(records):
+        key, offset = _read_part(records, offset)
+        data, offset = _read_part(records, offset)
+        if not key.decode().startswith(prefix):
+            continue
+        try:
+            program = load_program(data)
+        except ValueError:
+            continue
+        yield key.decode(), program
+
+
+def _read_part(records: bytes, offset: int) -> tuple[bytes, int]:
+    msg = "Truncated cost plans file"
+    start = offset + _LENGTH.size
+    if start > len(records):
+        raise ValueError(msg)
+    end = start + _LENGTH.unpack_from(records, offset)[0]
+    if end > len(records):
+        raise ValueError(msg)
+    return records[start:end], end
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import strawberry
+from graphql import GraphQLSchema, parse, validate
+
+from ._index import get_cost_index
+from ._persistence import dump_plans, load_plans
+from ._validation import _find_extension, compile_document, get_plan_key_prefix
+
+if TYPE_CHECKING:
+    from ._validation import CostProgram
+
+
+def _get_key_prefix(schema: GraphQLSchema) -> str:
+    extension = _find_extension(schema)
+    if extension is None:
+        msg = "Schema doesn't use QueryComplexityExtension"
+        raise ValueError(msg)
+    return get_plan_key_prefix(
+        get_cost_index(schema).fingerprint,
+        extension.default_complexity,
+        extension.complexity_ceiling,
+    )
+
+
+class TrustedDocuments:
+    """
+    Cost plans of trusted documents, computed once when they are added.
+
+    Documents are identified by the sha256 hex digest of their source,
+    the hash automatic persisted queries use. Requests for a trusted
+    document are costed from its plan without analysing the document.
+    Plans are kept per schema and cost settings, the same registry can
+    serve several schemas.
+    """
+
+    def __init__(self) -> None:
+        self._programs: dict[str, CostProgram] = {}
+
+    def __len__(self) -> int:
+        return len(self._programs)
+
+    def add(self, schema: strawberry.Schema, source: str) -> str:
+        """
+        Add the document `source`, return its ID.
+
+        Raises `ValueError` if the document isn't valid for `schema`.
+        """
+        graphql_schema = schema._schema  # noqa: SLF001
+        prefix = _get_key_prefix(graphql_schema)
+        document = parse(source)
+        if errors := validate(graphql_schema, document):
+            msg = f"Invalid document: {errors[0].message}"
+            raise ValueError(msg)
+
+        document_id = hashlib.sha256(source.encode()).hexdigest()
+        self._programs[prefix + document_id] = compile_document(
+            graphql_schema,
+            document,
+        )
+        return document_id
+
+    def add_directory(
+        self,
+        schema: strawberry.Schema,
+        directory: str | os.PathLike[str],
+    ) -> dict[str, str]:
+        """Add every `.graphql` file under `directory`, return IDs by path."""
+        return {
+            str(path): self.add(schema, path.read_text())
+            for path in sorted(Path(directory).rglob("*.graphql"))
+        }
+
+    def lookup(self, prefix: str, document_id: str) -> CostProgram | None:
+        return self._programs.get(prefix + document_id)
+
+    def get(
+        self,
+        schema: strawberry.Schema,
+        document_id: str,
+    ) -> CostProgram | None:
+        """Plan of the document `document_id` for `schema`."""
+        prefix = _get_key_prefix(schema._schema)  # noqa: SLF001
+        return self.lookup(prefix, document_id)
+
+    def dump(self, path: str | os.PathLike[str]) -> int:
+        """Write the registry to `path`, return how many plans."""
+        return dump_plans(self._programs.items(), path)
+
+    def load(
+        self,
+        schema: strawberry.Schema,
+        path: str | os.PathLike[str],
+    ) -> int:
+        """
+        Add plans written by `dump` for `schema`, return how many.
+
+        Plans computed for another version of `schema` or other cost
+        settings are ignored.
+        """
+        prefix = _get_key_prefix(schema._schema)  # noqa: SLF001
+        count = 0
+        for key, program in load_plans(path, prefix):
+            self._programs[key] = program
+            count += 1
+        return count
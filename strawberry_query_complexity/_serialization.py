@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+from array import array
+from typing import Any
+
+import strawberry
+
+from ._directives import ListCost
+from ._validation import Admission, CostProgram, ListSize, Variable
+
+FORMAT_VERSION = 1
+
+_LIST_COST_FIELDS = ("assumed_size", "arguments", "sized_fields", "max_size")
+
+
+def _dump_multiplier(multiplier: int | Variable) -> int | str:
+    return multiplier.name if isinstance(multiplier, Variable) else multiplier
+
+
+def _load_multiplier(multiplier: int | str) -> int | Variable:
+    return Variable(multiplier) if isinstance(multiplier, str) else multiplier
+
+
+def _dump_list_size(size: ListSize) -> dict[str, Any]:
+    directive = {
+        name: value
+        for name in _LIST_COST_FIELDS
+        if (value := getattr(size.directive, name)) is not strawberry.UNSET
+    }
+    return {
+        "directive": directive,
+        "multipliers": [_dump_multiplier(mult) for mult in size.multipliers],
+    }
+
+
+def _load_list_size(size: dict[str, Any]) -> ListSize:
+    return ListSize(
+        directive=ListCost(**size["directive"]),
+        multipliers=[_load_multiplier(mult) for mult in size["multipliers"]],
+    )
+
+
+def _dump_admission(admission: Admission | None) -> list[Any] | None:
+    if admission is None:
+        return None
+    return [
+        [list(key), coefficient] for key, coefficient in admission.terms.items()
+    ]
+
+
+def _load_admission(terms: list[Any] | None) -> Admission | None:
+    if terms is None:
+        return None
+    polynomial = {tuple(key): coefficient for key, coefficient in terms}
+    return Admission(
+        terms=polynomial,
+        slots=sorted({slot for key in polynomial for slot in key}),
+    )
+
+
+def dump_program(program: CostProgram) -> bytes:
+    """Encode `program` so that it can be shared with other processes."""
+    return json.dumps(
+        {
+            "version": FORMAT_VERSION,
+            "parents": program.parents.tolist(),
+            "kinds": program.kinds.tolist(),
+            "costs": list(program.costs),
+            "operands": list(program.operands),
+            "list_sizes": [
+                _dump_list_size(size) for size in program.list_sizes
+            ],
+            "operations": list(program.operations),
+            "fragments": list(program.fragments),
+            "fragment_order": list(program.fragment_order),
+            "ceiling": program.ceiling,
+            "admissions": [
+                _dump_admission(admission) for admission in program.admissions
+            ],
+        },
+        separators=(",", ":"),
+    ).encode()
+
+
+def load_program(data: bytes) -> CostProgram:
+    """
+    Decode a program encoded with `dump_program`.
+
+    Raises `ValueError` if `data` isn't a program of this format version.
+    """
+    try:
+        fields = json.loads(data)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        msg = "Invalid cost program"
+        raise ValueError(msg) from e
+    if not isinstance(fields, dict) or fields.get("version") != FORMAT_VERSION:
+        msg = "Unsupported cost program format"
+        raise ValueError(msg)
+
+    return CostProgram(
+        parents=array("i", fields["parents"]),
+        kinds=array("B", fields["kinds"]),
+        costs=fields["costs"],
+        operands=fields["operands"],
+        list_sizes=[_load_list_size(size) for size in fields["list_sizes"]],
+        operations=[
+            (segment[0], segment[1]) for segment in fields["operations"]
+        ],
+        fragments=[
+            None if segment is None else (segment[0], segment[1])
+            for segment in fields["fragments"]
+        ],
+        fragment_order=fields["fragment_order"],
+        ceiling=fields["ceiling"],
+        admissions=[_load_admission(terms) for terms in fields["admissions"]],
+    )
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+from typing import TYPE_CHECKING
+
+from ._cache import CostPlanCache, SingleFlight
+from ._mmap import SlotTable
+from ._serialization import dump_program, load_program
+
+if TYPE_CHECKING:
+    from ._validation import CostProgram
+
+_MAGIC = b"SQCPLAN1"
+# Sequence, key digest, stamp, data length
+_SLOT_HEADER = struct.Struct("<Q16sQI")
+_SEQUENCE = struct.Struct("<Q")
+
+# Slots a key can be stored in
+_WAYS = 4
+_READ_ATTEMPTS = 8
+
+
+class SharedPlanCache:
+    """
+    Cost plan cache shared by the processes of a host.
+
+    Plans are stored in a memory mapped file at `path`, holding a fixed
+    table of `slots` slots of `slot_size` bytes. A key can be stored in
+    one of four slots starting at its hash, the least recently written
+    one is evicted when all of them are taken. Plans that don't fit in a
+    slot aren't shared.
+
+    Writers hold an exclusive `flock` on the file. Readers don't lock,
+    every slot has a sequence number that is odd while the slot is being
+    written, a read is retried if the number changed while copying it.
+
+    The file outlives the processes using it, new workers start with the
+    plans computed by the others. Decoded plans are also kept in a
+    per-process `CostPlanCache` of `local_size` entries.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        slots: int = 4096,
+        slot_size: int = 16384,
+        local_size: int = 1024,
+    ) -> None:
+        if slots <= 0 or slot_size <= _SLOT_HEADER.size:
+            msg = f"slots must be positive and slot_size greater than {_SLOT_HEADER.size}"
+            raise ValueError(msg)
+
+        self._table = SlotTable(
+            path,
+            magic=_MAGIC,
+            slots=slots,
+            slot_size=slot_size,
+            ways=_WAYS,
+            kind="plan cache",
+        )
+        self.path = self._table.path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.hits = 0
+        self.misses = 0
+        self.flights = SingleFlight()
+        self._local = CostPlanCache(maxsize=local_size)
+        self._map = self._table.map
+
+    def close(self) -> None:
+        self._table.close()
+
+    def __len__(self) -> int:
+        return sum(
+            _SLOT_HEADER.unpack_from(self._map, offset)[2] != 0
+            for offset in self._table.offsets()
+        )
+
+    def _read_slot(self, offset: int, digest: bytes) -> bytes | None:
+        capacity = self.slot_size - _SLOT_HEADER.size
+        data_offset = offset + _SLOT_HEADER.size
+        for _ in range(_READ_ATTEMPTS):
+            sequence, slot_digest, _, length = _SLOT_HEADER.unpack_from(
+                self._map,
+                offset,
+            )
+            if sequence % 2:
+                continue
+            if slot_digest != digest:
+                return None
+            data = self._map[data_offset : data_offset + min(length, capacity)]
+            if _SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                return data
+        return None
+
+    def get(self, key: str) -> CostProgram | None:
+        plan = self._local.get(key)
+        if plan is None:
+            plan = self._get_shared(key)
+        if plan is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return plan
+
+    def _get_shared(self, key: str) -> CostProgram | None:
+        digest = _digest(key)
+        for offset in self._table.candidates(digest):
+            data = self._read_slot(offset, digest)
+            if data is None:
+                continue
+            try:
+                plan = load_program(data)
+            except ValueError:
+                return None
+            self._local.set(key, plan)
+            return plan
+        return None
+
+    def set(self, key: str, plan: CostProgram) -> None:
+        self._local.set(key, plan)
+        data = dump_program(plan)
+        if len(data) > self.slot_size - _SLOT_HEADER.size:
+            return
+
+        digest = _digest(key)
+        with self._table.write_lock:
+            clock = self._table.tick()
+            self._write_slot(self._choose_slot(digest), digest, clock, data)
+
+    def _choose_slot(self, digest: bytes) -> int:
+        """Slot already holding `digest`, else the least recently written."""
+        candidates = self._table.candidates(digest)
+        stamps = []
+        for offset in candidates:
+            _, slot_digest, stamp, _ = _SLOT_HEADER.unpack_from(
+                self._map,
+                offset,
+            )
+            if slot_digest == digest:
+                return offset
+            stamps.append(stamp)
+        return candidates[stamps.index(min(stamps))]
+
+    def _write_slot(
+        self,
+        offset: int,
+        digest: bytes,
+        stamp: int,
+        data: bytes,
+    ) -> None:
+        (sequence,) = _SEQUENCE.unpack_from(self._map, offset)
+        _SEQUENCE.pack_into(self._map, offset, sequence + 1)
+        _SLOT_HEADER.pack_into(
+            self._map,
+            offset,
+            sequence + 1,
+            digest,
+            stamp,
+            len(data),
+        )
+        data_offset = offset + _SLOT_HEADER.size
+        self._map[data_offset : data_offset + len(data)] = data
+        _SEQUENCE.pack_into(self._map, offset, sequence + 2)
+
+    def items(self) -> list[tuple[str, CostProgram]]:
+        """
+        Plans decoded by this process.
+
+        Only digests of keys are kept in the shared file.
+        """
+        return self._local.items()
+
+    def clear(self) -> None:
+        self._local.clear()
+        with self._table.write_lock:
+            for offset in self._table.offsets():
+                self._write_slot(offset, bytes(16), 0, b"")
+        self.hits = 0
+        self.misses = 0
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from ._directives import ListCost
+from ._persistence import write_atomic
+from ._sketch import QuantileSketch
+
+FORMAT_VERSION = 1
+
+FieldKey = tuple[str, str]
+
+
+@dataclasses.dataclass(slots=True)
+class LearnedSizes:
+    """Assumed sizes learned at one point, `version` identifies them."""
+
+    version: str
+    sizes: dict[FieldKey, int]
+    _directives: dict[FieldKey, ListCost] = dataclasses.field(
+        default_factory=dict,
+    )
+
+    def get_directive(self, field: FieldKey, directive: ListCost) -> ListCost:
+        """`directive` of `field` with its learned assumed size."""
+        size = self.sizes.get(field)
+        if size is None:
+            return directive
+        learned = self._directives.get(field)
+        if learned is None:
+            learned = self._directives[field] = dataclasses.replace(
+                directive,
+                assumed_size=size,
+            )
+        return learned
+
+
+class ListSizeStats:
+    """
+    Lengths of lists returned by `ListCost` fields, sketched per field.
+
+    Lengths are kept in a `QuantileSketch` per object type field. With
+    `percentile`, costs use that percentile of the lengths a field
+    returned instead of its `assumed_size`, once it has `min_samples` of
+    them. Learned sizes are refreshed every `refresh_interval` seconds,
+    cost plans are cached apart for each set of learned sizes.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        percentile: float | None = None,
+        min_samples: int = 1000,
+        relative_accuracy: float = 0.01,
+        max_bins: int = 512,
+        refresh_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if percentile is not None and not 0 <= percentile <= 1:
+            msg = "percentile must be in [0, 1]"
+            raise ValueError(msg)
+
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._sketches: dict[FieldKey, QuantileSketch] = {}
+        self._lock = threading.Lock()
+        self._learned = _learn({})
+        self._refreshed = clock()
+
+    def _new_sketch(self) -> QuantileSketch:
+        return QuantileSketch(
+            relative_accuracy=self.relative_accuracy,
+            max_bins=self.max_bins,
+        )
+
+    def observe(self, field: FieldKey, length: int) -> None:
+        with self._lock:
+            sketch = self._sketches.get(field)
+            if sketch is None:
+                sketch = self._sketches[field] = self._new_sketch()
+            sketch.add(length)
+
+    def summary(self) -> dict[str, dict[str, float | None]]:
+        """Observed count and p50, p95 and p99 lengths of each field."""
+        with self._lock:
+            return {
+                f"{type_name}.{field_name}": {
+                    "count": sketch.count,
+                    "p50": sketch.quantile(0.5),
+                    "p95": sketch.quantile(0.95),
+                    "p99": sketch.quantile(0.99),
+                }
+                for (type_name, field_name), sketch in sorted(
+                    self._sketches.items(),
+                )
+            }
+
+    def get_learned_sizes(self) -> LearnedSizes | None:
+        """Sizes costs should use now, `None` unless learning sizes."""
+        if self.percentile is None:
+            return None
+        now = self._clock()
+        if now - self._refreshed >= self.refresh_interval:
+            self._refreshed = now
+            self.refresh()
+        return self._learned
+
+    def refresh(self) -> None:
+        """Learn sizes from lengths observed so far."""
+        if self.percentile is None:
+            return
+        with self._lock:
+            sizes = {}
+            for field, sketch in self._sketches.items():
+                if sketch.count < self.min_samples:
+                    continue
+                value = sketch.quantile(self.percentile)
+                if value is not None:
+                    # Lengths are whole, the estimate is within accuracy
+                    sizes[field] = round(value)
+
+        if sizes != self._learned.sizes:
+            self._learned = _learn(sizes)
+
+    def dump(self, path: str | os.PathLike[str]) -> int:
+        """Write sketches to `path`, return how many fields."""
+        with self._lock:
+            fields = [
+                [type_name, field_name, sketch.to_dict()]
+                for (type_name, field_name), sketch in self._sketches.items()
+            ]
+        data = {"version": FORMAT_VERSION, "fields": fields}
+        write_atomic(path, json.dumps(data).encode())
+        return len(fields)
+
+    def load(self, path: str | os.PathLike[str]) -> int:
+        """
+        Add sketches written by `dump`, return how many fields.
+
+        Raises `ValueError` if the file isn't valid, sizes are learned
+        from the loaded lengths right away.
+        """
+        fields = _read_fields(path)
+        with self._lock:
+            for type_name, field_name, sketch_data in fields:
+                sketch = QuantileSketch.from_dict(
+                    sketch_data,
+                    max_bins=self.max_bins,
+                )
+                existing = self._sketches.get((type_name, field_name))
+                if existing is None:
+                    existing = self._sketches[(type_name, field_name)] = (
+                        self._new_sketch()
+                    )
+                existing.merge(sketch)
+        self.refresh()
+        return len(fields)
+
+
+def _learn(sizes: dict[FieldKey, int]) -> LearnedSizes:
+    digest = hashlib.sha256(repr(sorted(sizes.items())).encode())
+    return LearnedSizes(version=digest.hexdigest()[:16], sizes=sizes)
+
+
+def _read_fields(path: str | os.PathLike[str]) -> list[Any]:
+    try:
+        data = json.loads(Path(path).read_text())
+    except json.JSONDecodeError as e:
+        msg = f"{path} is not a list sizes file"
+        raise ValueError(msg) from e
+    if not isinstance(data, dict) or data.get("version") != FORMAT_VERSION:
+        msg = f"{path} is not a list sizes file of this version"
+        raise ValueError(msg)
+    return data["fields"]  # type: ignore[no-any-return]
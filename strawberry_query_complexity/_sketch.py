@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable
+from typing import Any
+
+
+class QuantileSketch:
+    """
+    DDSketch of non-negative values, in fixed memory.
+
+    Quantiles are within `relative_accuracy` of the true value. Values
+    are counted in logarithmic bins, at most `max_bins` of them, the
+    lowest bins are merged once there are more, so accuracy is only lost
+    on the smallest values. Zeroes are counted apart.
+    """
+
+    def __init__(
+        self,
+        *,
+        relative_accuracy: float = 0.01,
+        max_bins: int = 512,
+    ) -> None:
+        if not 0 < relative_accuracy < 1:
+            msg = "relative_accuracy must be in (0, 1)"
+            raise ValueError(msg)
+        if max_bins < 1:
+            msg = "max_bins must be positive"
+            raise ValueError(msg)
+
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.count = 0
+        self.zero_count = 0
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._bins: dict[int, int] = {}
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self._bins[key] = self._bins.get(key, 0) + count
+        if len(self._bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        lowest, second = sorted(self._bins)[:2]
+        self._bins[second] += self._bins.pop(lowest)
+
+    def _add_bins(self, zero_count: int, bins: Iterable[list[int]]) -> None:
+        self.add(0, zero_count)
+        for key, count in bins:
+            self._bins[key] = self._bins.get(key, 0) + count
+            self.count += count
+        while len(self._bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Value at quantile `q`, `None` while the sketch is empty.
+
+        This is the nearest rank: the smallest value with at least a `q`
+        share of the values at or below it.
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, math.ceil(q * self.count))
+        if rank <= self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self._bins):
+            seen += self._bins[key]
+            if seen >= rank:
+                return 2 * self._gamma**key / (self._gamma + 1)
+        return None  # pragma: no cover
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Add the values counted by `other`, of the same accuracy."""
+        if other.relative_accuracy != self.relative_accuracy:
+            msg = "Can't merge sketches of different accuracy"
+            raise ValueError(msg)
+
+        self._add_bins(other.zero_count, other.to_dict()["bins"])
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "relativeAccuracy": self.relative_accuracy,
+            "zeroCount": self.zero_count,
+            "bins": [[key, count] for key, count in sorted(self._bins.items())],
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict[str, Any],
+        *,
+        max_bins: int = 512,
+    ) -> QuantileSketch:
+        """Load a sketch from `to_dict`, raise `ValueError` if invalid."""
+        try:
+            sketch = cls(
+                relative_accuracy=data["relativeAccuracy"],
+                max_bins=max_bins,
+            )
+            cls._add_bins(
+                sketch,
+                int(data["zeroCount"]),
+                [[int(key), int(count)] for key, count in data["bins"]],
+            )
+        except (KeyError, TypeError) as e:
+            msg = "Invalid sketch"
+            raise ValueError(msg) from e
+        return sketch
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import dataclasses
-import typing
-from collections.abc import MutableMapping
-from typing import TYPE_CHECKING, TypeVar
+import hashlib
+import math
+import weakref
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING, Any
 
 import strawberry
 from graphql import (
@@ -14,18 +17,22 @@ from graphql import (
     GraphQLError,
     GraphQLField,
     GraphQLInterfaceType,
-    GraphQLNamedType,
+    GraphQLObjectType,
     GraphQLSchema,
     GraphQLUnionType,
-    GraphQLWrappingType,
     OperationDefinitionNode,
+    TypeInfo,
+    TypeInfoVisitor,
     ValidationContext,
     ValidationRule,
-    Visitor,
+    VariableNode,
     VisitorAction,
-    get_argument_values,
     get_named_type,
+    get_operation_ast,
     get_variable_values,
+    print_ast,
+    value_from_ast,
+    visit,
 )
 from strawberry.schema.schema_converter import GraphQLCoreConverter
 from strawberry.types import ExecutionContext
@@ -34,12 +41,18 @@ from ._context import (
     ComplexityResult,
     _complexity_var,
 )
-from ._directives import AnyCostDirective, Cost, ListCost
+from ._directives import (
+    AnyCostDirective,
+    Cost,
+    ListCost,
+    _get_unset_value,
+)
+from ._index import _max_cost, get_cost_index
 
 if TYPE_CHECKING:
+    from ._cache import Flight
     from ._extension import QueryComplexityExtension
-
-T = TypeVar("T")
+    from ._sizes import LearnedSizes
 
 _STRAWBERRY_KEY = GraphQLCoreConverter.DEFINITION_BACKREF
 
@@ -54,97 +67,546 @@ def _find_extension(schema: GraphQLSchema) -> QueryComplexityExtension | None:
     return None
 
 
-def _get_unset_value(value: T | None, default: T) -> T:
-    if value is None or value is strawberry.UNSET:
-        return default
-    return value
+@dataclasses.dataclass(frozen=True, slots=True)
+class Variable:
+    name: str
 
 
-@dataclasses.dataclass(kw_only=True, slots=True)
-class FragmentLateEval:
-    name: str
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
+class ListSize:
+    """Size of a list field that depends on variables."""
 
+    directive: ListCost
+    multipliers: Sequence[int | Variable]
 
-@dataclasses.dataclass(kw_only=True, slots=True)
-class State:
-    directive: AnyCostDirective | None = None
-    added_complexity: int = 0
-    multipliers: list[int] = dataclasses.field(default_factory=list)
-    children: list[State | FragmentLateEval] = dataclasses.field(
-        default_factory=list,
-    )
 
+# Node kinds of a `CostProgram`
+ADD = 0  # operand is the own cost, added to the cost of children
+LIST = 1  # operand is the list size or `~index` into `list_sizes`
+SPREAD = 2  # operand is the index of the spread fragment
 
-def default_cost_compare_key(directive: AnyCostDirective | None) -> int:
-    if directive is None:
-        return -1
+_Segment = tuple[int, int]
+# Sorted `list_sizes` indexes of a term -> its coefficient
+_Polynomial = dict[tuple[int, ...], int]
 
-    if isinstance(directive, ListCost):
-        return _get_unset_value(directive.assumed_size, 0)
+MAX_ADMISSION_TERMS = 64
 
-    return _get_unset_value(directive.complexity, 0)
 
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
+class Admission:
+    """
+    Cost of an operation as a polynomial of its variable list sizes.
 
-def _get_cost_directive(
-    schema: GraphQLSchema,
-    node: GraphQLWrappingType[GraphQLNamedType] | GraphQLNamedType | None,
-) -> AnyCostDirective | None:
-    if not node:
-        return None
+    Cost only grows with list sizes, so checking a request against the
+    max complexity only takes computing the polynomial, and the largest
+    value of a variable that still fits can be solved for.
+    """
 
-    node = get_named_type(node)
-    if isinstance(node, GraphQLInterfaceType):
-        return max(
-            (
-                _get_cost_directive(schema, obj)
-                for obj in schema.get_implementations(
-                    node,
-                ).objects
-            ),
-            key=default_cost_compare_key,
+    terms: Mapping[tuple[int, ...], int]
+    slots: Sequence[int]
+
+
+def _add_polynomial(
+    target: _Polynomial,
+    source: Mapping[tuple[int, ...], int],
+    ceiling: int,
+) -> None:
+    for key, coefficient in source.items():
+        if coefficient:
+            target[key] = min(target.get(key, 0) + coefficient, ceiling)
+
+
+def _scale_polynomial(
+    polynomial: Mapping[tuple[int, ...], int],
+    operand: int,
+    ceiling: int,
+) -> _Polynomial:
+    if operand == 0:
+        return {}
+    if operand > 0:
+        return {
+            key: min(coefficient * operand, ceiling)
+            for key, coefficient in polynomial.items()
+        }
+    return {
+        tuple(sorted((*key, ~operand))): coefficient
+        for key, coefficient in polynomial.items()
+    }
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
+class CostProgram:
+    """
+    Variable independent cost structure of a document.
+
+    Nodes are stored in parallel arrays in pre-order, every node comes
+    after its parent. `costs` holds the cost of children already folded
+    in (and the item type cost for lists), only nodes that can't be folded
+    before variables and fragments are known are kept.
+
+    `operations` holds a `(start, end)` node range per operation definition,
+    in document order, and `fragments` one per fragment, `None` when
+    the fragment wasn't planned. `fragment_order` lists fragment indexes so
+    that every fragment comes after the ones it spreads.
+    """
+
+    parents: array[int]
+    kinds: array[int]
+    costs: Sequence[int]
+    operands: Sequence[int]
+    list_sizes: Sequence[ListSize]
+    operations: Sequence[_Segment]
+    fragments: Sequence[_Segment | None]
+    fragment_order: Sequence[int]
+    ceiling: int
+    admissions: Sequence[Admission | None] = ()
+
+    @property
+    def has_variables(self) -> bool:
+        return bool(self.list_sizes)
+
+    def evaluate(self, operation: int, variables: Mapping[str, Any]) -> int:
+        """Cost of the operation at index `operation`."""
+        if self.admissions and (admission := self.admissions[operation]):
+            return self._admission_cost(admission, variables)
+
+        sizes = [
+            _get_list_size(
+                size.directive,
+                size.multipliers,
+                variables,
+                self.ceiling,
+            )
+            for size in self.list_sizes
+        ]
+        fragment_costs = [0] * len(self.fragments)
+        for fragment in self.fragment_order:
+            segment = self.fragments[fragment]
+            if segment is not None:
+                fragment_costs[fragment] = self._evaluate_segment(
+                    segment,
+                    sizes,
+                    fragment_costs,
+                )
+        return self._evaluate_segment(
+            self.operations[operation],
+            sizes,
+            fragment_costs,
         )
 
-    for extension in node.extensions.values():
-        for directive in extension.directives:
-            if isinstance(directive, typing.get_args(AnyCostDirective)):
-                return directive  # type: ignore[no-any-return]
-    return None
+    def _admission_cost(
+        self,
+        admission: Admission,
+        variables: Mapping[str, Any],
+    ) -> int:
+        sizes = {
+            slot: _get_list_size(
+                self.list_sizes[slot].directive,
+                self.list_sizes[slot].multipliers,
+                variables,
+                self.ceiling,
+            )
+            for slot in admission.slots
+        }
+        cost = 0
+        for key, coefficient in admission.terms.items():
+            term = coefficient
+            for slot in key:
+                term *= sizes[slot]
+            cost += term
+        return min(cost, self.ceiling)
+
+    def solve_variables(
+        self,
+        operation: int,
+        variables: Mapping[str, Any],
+        max_complexity: int,
+    ) -> dict[str, int]:
+        """
+        Largest value of each variable that keeps the operation in budget.
+
+        Every other variable keeps its value from `variables`, variables
+        that don't fit with any value or fit with every value are omitted.
+        """
+        admission = self.admissions[operation] if self.admissions else None
+        if admission is None:
+            return {}
+
+        names = {
+            mult.name
+            for slot in admission.slots
+            for mult in self.list_sizes[slot].multipliers
+            if isinstance(mult, Variable)
+        }
+        bounds = {
+            name: self._solve_variable(
+                admission,
+                variables,
+                name,
+                max_complexity,
+            )
+            for name in sorted(names)
+        }
+        return {
+            name: bound for name, bound in bounds.items() if bound is not None
+        }
+
+    def _solve_variable(
+        self,
+        admission: Admission,
+        variables: Mapping[str, Any],
+        name: str,
+        max_complexity: int,
+    ) -> int | None:
+        def fits(value: int) -> bool:
+            cost = self._admission_cost(admission, {**variables, name: value})
+            return cost <= max_complexity
+
+        if not fits(0) or fits(self.ceiling):
+            return None
+
+        # Cost only grows with the variable
+        low, high = 0, self.ceiling
+        while high - low > 1:
+            middle = (low + high) // 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def compile_admissions(self) -> list[Admission | None]:
+        """
+        Solve every operation into an `Admission`.
+
+        Operations whose polynomial has more than `MAX_ADMISSION_TERMS`
+        terms are left as `None` and evaluated node by node.
+        """
+        fragments: list[_Polynomial | None] = [{} for _ in self.fragments]
+        for fragment in self.fragment_order:
+            segment = self.fragments[fragment]
+            if segment is not None:
+                fragments[fragment] = self._compile_segment(segment, fragments)
+
+        admissions: list[Admission | None] = []
+        for segment in self.operations:
+            polynomial = self._compile_segment(segment, fragments)
+            admissions.append(
+                (
+                    None
+                    if polynomial is None
+                    else Admission(
+                        terms=polynomial,
+                        slots=sorted(
+                            {slot for key in polynomial for slot in key},
+                        ),
+                    )
+                ),
+            )
+        return admissions
+
+    def _compile_segment(
+        self,
+        segment: _Segment,
+        fragments: Sequence[_Polynomial | None],
+    ) -> _Polynomial | None:
+        start, end = segment
+        ceiling = self.ceiling
+        totals: list[_Polynomial] = [
+            {(): cost} if cost else {} for cost in self.costs[start:end]
+        ]
+
+        value: _Polynomial | None = {}
+        for i in range(end - 1, start - 1, -1):
+            kind = self.kinds[i]
+            operand = self.operands[i]
+            if kind == SPREAD:
+                value = fragments[operand]
+            elif kind == LIST:
+                value = _scale_polynomial(totals[i - start], operand, ceiling)
+            else:
+                value = totals[i - start]
+                _add_polynomial(value, {(): operand}, ceiling)
+
+            if value is None or len(value) > MAX_ADMISSION_TERMS:
+                return None
+            parent = self.parents[i] - start
+            if parent >= 0:
+                _add_polynomial(totals[parent], value, ceiling)
+        return value
+
+    def _evaluate_segment(
+        self,
+        segment: _Segment,
+        sizes: Sequence[int],
+        fragment_costs: Sequence[int],
+    ) -> int:
+        start, end = segment
+        ceiling = self.ceiling
+        parents, kinds, operands = self.parents, self.kinds, self.operands
+        totals = list(self.costs[start:end])
+
+        # Children come after their parent, walking backwards finishes
+        # every node before it is added to its parent.
+        value = 0
+        for i in range(end - 1, start - 1, -1):
+            kind = kinds[i]
+            operand = operands[i]
+            if kind == SPREAD:
+                value = fragment_costs[operand]
+            elif kind == LIST:
+                size = operand if operand >= 0 else sizes[~operand]
+                value = min(totals[i - start] * size, ceiling)
+            else:
+                value = min(totals[i - start] + operand, ceiling)
+
+            parent = parents[i] - start
+            if parent >= 0:
+                totals[parent] = min(totals[parent] + value, ceiling)
+        return value
+
+
+class CostProgramBuilder:
+    """
+    Build a `CostProgram` while walking a document.
+
+    Selections are entered and left in document order. A selection is
+    only added to the program once its cost turns out to depend on
+    variables or fragments, otherwise it is folded into its parent when
+    it is left.
+    """
+
+    def __init__(self, *, default_cost: int, ceiling: int) -> None:
+        self.default_cost = default_cost
+        self.ceiling = ceiling
+        self._parents = array("i")
+        self._kinds = array("B")
+        self._costs: list[int] = []
+        self._operands: list[int] = []
+        self._list_sizes: list[ListSize] = []
+        self._list_size_ids: dict[
+            tuple[int, tuple[int | Variable, ...]],
+            int,
+        ] = {}
+        self._operations: list[_Segment] = []
+        self._fragments: list[_Segment | None] = []
+        self._fragment_ids: dict[str, int] = {}
+        # Entered selections as `[kind, cost, operand, index]`, index is
+        # -1 until the selection is added to the program.
+        self._stack: list[list[int]] = []
+
+    def _add(self, parent: int, kind: int, operand: int) -> int:
+        index = len(self._kinds)
+        self._parents.append(parent)
+        self._kinds.append(kind)
+        self._costs.append(0)
+        self._operands.append(operand)
+        return index
+
+    def _materialize(self) -> int:
+        """Add entered selections to the program, return the innermost."""
+        stack = self._stack
+        first = len(stack)
+        while stack[first - 1][3] < 0:
+            first -= 1
+        for position in range(first, len(stack)):
+            entry = stack[position]
+            entry[3] = self._add(stack[position - 1][3], entry[0], entry[2])
+        return stack[-1][3]
+
+    def _fragment_id(self, name: str) -> int:
+        if name not in self._fragment_ids:
+            self._fragment_ids[name] = len(self._fragments)
+            self._fragments.append(None)
+        return self._fragment_ids[name]
 
+    def _list_size_id(
+        self,
+        directive: ListCost,
+        multipliers: Sequence[int | Variable],
+    ) -> int:
+        key = (id(directive), tuple(multipliers))
+        if key not in self._list_size_ids:
+            self._list_size_ids[key] = len(self._list_sizes)
+            self._list_sizes.append(
+                ListSize(directive=directive, multipliers=multipliers),
+            )
+        return self._list_size_ids[key]
+
+    def _enter_root(self) -> None:
+        index = self._add(-1, ADD, self.default_cost)
+        self._stack.append([ADD, 0, self.default_cost, index])
+
+    def _leave_root(self) -> _Segment:
+        _, cost, _, index = self._stack.pop()
+        self._costs[index] = cost
+        return index, len(self._kinds)
+
+    def enter_operation(self) -> None:
+        self._enter_root()
+
+    def leave_operation(self) -> None:
+        self._operations.append(self._leave_root())
+
+    def enter_fragment(self) -> None:
+        self._enter_root()
+
+    def leave_fragment(self, name: str) -> None:
+        self._fragments[self._fragment_id(name)] = self._leave_root()
+
+    def enter_field(
+        self,
+        directive: AnyCostDirective | None,
+        multipliers: Sequence[int | Variable],
+        item_cost: int,
+    ) -> None:
+        if not isinstance(directive, ListCost):
+            own_cost = get_own_cost(directive, self.default_cost)
+            self._stack.append([ADD, 0, own_cost, -1])
+        elif any(isinstance(mult, Variable) for mult in multipliers):
+            size = ~self._list_size_id(directive, multipliers)
+            self._stack.append([LIST, item_cost, size, -1])
+            self._materialize()
+        else:
+            size = _get_list_size(directive, multipliers, {}, self.ceiling)
+            self._stack.append([LIST, item_cost, size, -1])
+
+    def leave_field(self) -> None:
+        kind, cost, operand, index = self._stack.pop()
+        if index >= 0:
+            self._costs[index] = cost
+            return
 
-def _add_field_variables_to_state(  # noqa: PLR0913
-    operation: OperationDefinitionNode | None,
-    execution_context: ExecutionContext,
-    type_def: GraphQLField,
+        if kind == LIST:
+            cost = min(cost * operand, self.ceiling)
+        else:
+            cost = min(cost + operand, self.ceiling)
+        parent = self._stack[-1]
+        parent[1] = min(parent[1] + cost, self.ceiling)
+
+    def spread(self, name: str) -> None:
+        self._add(self._materialize(), SPREAD, self._fragment_id(name))
+
+    def build(self, fragment_order: Sequence[str]) -> CostProgram:
+        program = CostProgram(
+            parents=self._parents,
+            kinds=self._kinds,
+            costs=self._costs,
+            operands=self._operands,
+            list_sizes=self._list_sizes,
+            operations=self._operations,
+            fragments=self._fragments,
+            fragment_order=[
+                self._fragment_ids[name]
+                for name in fragment_order
+                if name in self._fragment_ids
+            ],
+            ceiling=self.ceiling,
+        )
+        return dataclasses.replace(
+            program,
+            admissions=program.compile_admissions(),
+        )
+
+
+def get_own_cost(directive: AnyCostDirective | None, default: int) -> int:
+    """Cost of a field that isn't a list, not counting its children."""
+    if isinstance(directive, Cost):
+        return _get_unset_value(directive.complexity, default=default)
+    return default
+
+
+def _get_multipliers(
+    field: GraphQLField,
     node: FieldNode,
-    state: State,
     cost: AnyCostDirective | None,
-) -> VisitorAction:
+) -> list[int | Variable]:
     if not isinstance(cost, ListCost) or not cost.arguments:
-        return None
+        return []
 
-    variables_values = get_variable_values(
-        schema=execution_context.schema._schema,  # noqa: SLF001
-        var_def_nodes=operation.variable_definitions if operation else [],
-        inputs=execution_context.variables or {},
-    )
-    if isinstance(variables_values, list):
-        if execution_context.errors is None:
-            execution_context.errors = []
-        execution_context.errors.extend(variables_values)
+    multipliers: list[int | Variable] = []
+    for arg in node.arguments:
+        name = arg.name.value
+        if name not in cost.arguments or name not in field.args:
+            continue
+        if isinstance(arg.value, VariableNode):
+            multipliers.append(Variable(arg.value.name.value))
+        elif isinstance(
+            value := value_from_ast(arg.value, field.args[name].type),
+            int,
+        ):
+            multipliers.append(value)
+    return multipliers
 
-        return Visitor.BREAK
 
-    argument_values = get_argument_values(
-        type_def=type_def,
-        node=node,
-        variable_values=variables_values,
-    )
+def _sort_fragments(dependencies: Mapping[str, Sequence[str]]) -> list[str]:
+    """
+    Order fragments so that dependencies come first.
 
-    for arg in node.arguments:
-        if arg.name.value not in cost.arguments:
+    Spreads forming a cycle are dropped, documents containing them are
+    rejected by `NoFragmentCyclesRule` anyway.
+    """
+    order: list[str] = []
+    visited: set[str] = set()
+    for root in dependencies:
+        if root in visited:
             continue
-        state.multipliers.append(argument_values[arg.name.value])
-    return None
+        visited.add(root)
+        stack = [(root, iter(dependencies[root]))]
+        while stack:
+            name, spreads = stack[-1]
+            for spread in spreads:
+                if spread not in visited and spread in dependencies:
+                    visited.add(spread)
+                    stack.append((spread, iter(dependencies[spread])))
+                    break
+            else:
+                stack.pop()
+                order.append(name)
+    return order
+
+
+def _resolve_multipliers(
+    multipliers: Sequence[int | Variable],
+    variables: Mapping[str, Any],
+) -> list[int]:
+    values = (
+        variables.get(mult.name) if isinstance(mult, Variable) else mult
+        for mult in multipliers
+    )
+    return [value for value in values if value is not None]
+
+
+def _get_list_size(
+    directive: ListCost,
+    multipliers: Sequence[int | Variable],
+    variables: Mapping[str, Any],
+    ceiling: int,
+) -> int:
+    """
+    Size of a list field, at most `ceiling`.
+
+    Argument values are clamped to `[0, directive.max_size]`, the assumed
+    size is used when none of the arguments are given.
+    """
+    max_size = min(_get_unset_value(directive.max_size, ceiling), ceiling)
+    sizes = _resolve_multipliers(multipliers, variables)
+    if not sizes:
+        return min(_get_unset_value(directive.assumed_size, 0), ceiling)
+    return min(sum(min(max(size, 0), max_size) for size in sizes), ceiling)
+
+
+def get_plan_key_prefix(
+    fingerprint: str,
+    default_cost: int,
+    ceiling: int,
+    sizes_version: str | None = None,
+) -> str:
+    """Start of the plan keys of a schema and cost settings."""
+    prefix = f"{fingerprint}:{default_cost}:{ceiling}:"
+    if sizes_version is not None:
+        prefix += f"{sizes_version}:"
+    return prefix
 
 
 class QueryComplexityValidationRule(ValidationRule):
@@ -154,187 +616,493 @@ class QueryComplexityValidationRule(ValidationRule):
             # type: ignore[assignment]
             context.schema,
         )
-        self._state: list[State] = []
-        self._fragments: MutableMapping[str, State] = {}
+        self._index = get_cost_index(context.schema)
+        # Max complexity of this request, it follows load if adaptive
+        self._max_complexity = 0
+        # List sizes learned from execution, if costs use them
+        self._learned: LearnedSizes | None = None
+        self._program: CostProgramBuilder | None = None
+        self._fragment_dependencies: dict[str, list[str]] = {}
+        self._current_fragment: str | None = None
+        self._plan_key = ""
+        # Computation of the plan led by this rule, if any
+        self._flight: Flight | None = None
 
-        self._operation_definitions: list[OperationDefinitionNode] = []
+        # Operation that is going to be executed and the operations and
+        # fragments that are walked to build the plan.
+        self._selected_operation: OperationDefinitionNode | None = None
+        self._planned_operations: list[OperationDefinitionNode] = []
+        self._planned_fragments: set[str] | None = None
+
+        # Running lower bound of the operation cost, `_scales` holds how
+        # many times cost added under each selection is counted.
+        self._lower_bound = 0
+        self._scales: list[int] = []
+        self._variables: Mapping[str, Any] = {}
+        self._coerced_variables: dict[int, dict[str, Any] | None] = {}
+
+    @property
+    def program(self) -> CostProgramBuilder:
+        assert self._program is not None  # noqa: S101
+        return self._program
 
     @property
     def execution_context(self) -> ExecutionContext:
         return self.extension.execution_context
 
-    @property
-    def operation_definition(self) -> OperationDefinitionNode | None:
-        if not self._operation_definitions:
-            return None
-        return self._operation_definitions[-1]
+    def _get_key_prefix(self, sizes_version: str | None = None) -> str:
+        return get_plan_key_prefix(
+            self._index.fingerprint,
+            self.extension.default_complexity,
+            self.extension.complexity_ceiling,
+            sizes_version,
+        )
 
-    def _enter(self, state: State, *, contributes_to_cost: bool = True) -> None:
-        if contributes_to_cost:
-            self._state[-1].children.append(state)
-        self._state.append(state)
+    def _get_plan_key(self, document: DocumentNode) -> str:
+        operation = (
+            "*"
+            if self.extension.report_operation_costs
+            else self.execution_context.operation_name or ""
+        )
+        prefix = self._get_key_prefix(
+            self._learned.version if self._learned is not None else None,
+        )
+        return f"{prefix}{operation}:{self._hash_document(document)}"
 
-    def _leave(self) -> State:
-        return self._state.pop()
+    def _hash_document(self, document: DocumentNode) -> str:
+        source = self.execution_context.query or print_ast(document)
+        return hashlib.sha256(source.encode()).hexdigest()
 
-    def enter_operation_definition(
+    def _select_operations(
         self,
-        node: OperationDefinitionNode,
-        *args: object,
+        document: DocumentNode,
+        *,
+        plan_all: bool = False,
     ) -> None:
-        self._operation_definitions.append(node)
+        self._selected_operation = get_operation_ast(
+            document,
+            self.execution_context.operation_name,
+        )
+        if (
+            plan_all
+            or self._selected_operation is None
+            or self.extension.report_operation_costs
+        ):
+            # Operation can't be determined, cost every one of them
+            self._planned_operations = [
+                definition
+                for definition in document.definitions
+                if isinstance(definition, OperationDefinitionNode)
+            ]
+            return
 
-    def leave_operation_definition(self, *args: object) -> None:
-        self._operation_definitions.pop()
+        self._planned_operations = [self._selected_operation]
 
-    def _calculate_complexity(
-        self,
-        state: State,
-        children_complexity: int,
-    ) -> int:
-        if isinstance(state.directive, ListCost):
-            complexity = state.added_complexity + children_complexity
-            return sum(
-                complexity * mult
-                for mult in state.multipliers
-                or [_get_unset_value(state.directive.assumed_size, 0)]
+    def _select_fragments(self) -> None:
+        """Walk only the fragments spread by the one planned operation."""
+        planned = self._planned_operations
+        if len(planned) != 1 or planned[0] is not self._selected_operation:
+            return
+        self._planned_fragments = {
+            fragment.name.value
+            for fragment in self.context.get_recursively_referenced_fragments(
+                planned[0],
             )
+        }
 
-        if isinstance(state.directive, Cost):
-            return (
-                _get_unset_value(
-                    state.directive.complexity,
-                    default=self.extension.default_complexity,
-                )
-                + children_complexity
+    def _is_counted(self, operation: OperationDefinitionNode) -> bool:
+        return (
+            self._selected_operation is None
+            or operation is self._selected_operation
+        )
+
+    def _coerce_variables(
+        self,
+        operation: OperationDefinitionNode,
+    ) -> dict[str, Any] | None:
+        """
+        Coerce variables of `operation`, once per operation.
+
+        Coercion errors are added to the execution context and `None` is
+        returned, operation cost is not computed in that case.
+        """
+        key = id(operation)
+        if key in self._coerced_variables:
+            return self._coerced_variables[key]
+
+        variables_values = get_variable_values(
+            schema=self.context.schema,
+            var_def_nodes=operation.variable_definitions,
+            inputs=self.execution_context.variables or {},
+        )
+        if isinstance(variables_values, list):
+            if self.execution_context.errors is None:
+                self.execution_context.errors = []
+            self.execution_context.errors.extend(variables_values)
+            self._coerced_variables[key] = None
+            return None
+
+        self._coerced_variables[key] = variables_values
+        return variables_values
+
+    def _evaluate_operation(
+        self,
+        operation: OperationDefinitionNode,
+        index: int,
+        program: CostProgram,
+    ) -> int | None:
+        variables = (
+            self._coerce_variables(operation) if program.has_variables else {}
+        )
+        if variables is None:
+            return None
+        return program.evaluate(index, variables)
+
+    def _report_complexity(self, program: CostProgram) -> None:
+        complexity = 0
+        operation_costs: dict[str, int] = {}
+        for index, operation in enumerate(self._planned_operations):
+            if not (
+                self.extension.report_operation_costs
+                or self._is_counted(operation)
+            ):
+                continue
+            cost = self._evaluate_operation(operation, index, program)
+            if cost is None:
+                if self._is_counted(operation):
+                    return
+                continue
+
+            operation_costs[operation.name.value if operation.name else ""] = (
+                cost
             )
+            if self._is_counted(operation):
+                complexity = min(
+                    complexity + cost,
+                    self.extension.complexity_ceiling,
+                )
+
+        self._check_complexity(
+            complexity,
+            operations=(
+                operation_costs
+                if self.extension.report_operation_costs
+                else None
+            ),
+            variables=(
+                self._solve_variables(program)
+                if complexity > self._max_complexity
+                else None
+            ),
+        )
+
+    def _charge_budget(self, complexity: int) -> None:
+        """Charge the complexity of an accepted request to its client."""
+        budget = self.extension.budget
+        if budget is None or self.extension.client_key is None:
+            return
+        client = self.extension.client_key(self.execution_context)
+        if client is None:
+            return
+
+        retry_after = budget.charge(client, complexity)
+        if retry_after is None:
+            return
+        extensions: dict[str, Any] = {"cost": complexity}
+        if math.isfinite(retry_after):
+            extensions["retryAfter"] = math.ceil(retry_after * 1000) / 1000
+        self.report_error(
+            GraphQLError(
+                f"Complexity budget of the client is exhausted, complexity of {complexity} can't be charged",
+                extensions={"budget": extensions},
+            ),
+        )
+
+    def _solve_variables(self, program: CostProgram) -> dict[str, int]:
+        """Largest values of the executed operation variables that fit."""
+        operation = self._selected_operation
+        if operation is None or not program.has_variables:
+            return {}
+
+        index = next(
+            index
+            for index, planned in enumerate(self._planned_operations)
+            if planned is operation
+        )
+        return program.solve_variables(
+            index,
+            self._coerce_variables(operation) or {},
+            self._max_complexity,
+        )
 
-        return self.extension.default_complexity + children_complexity
+    def _check_complexity(
+        self,
+        complexity: int,
+        *,
+        lower_bound: bool = False,
+        operations: dict[str, int] | None = None,
+        variables: Mapping[str, int] | None = None,
+    ) -> None:
+        _complexity_var.set(
+            ComplexityResult(
+                current=complexity,
+                max=self._max_complexity,
+                operations=operations,
+            ),
+        )
 
-    def _resolve_complexity(self, state: State | FragmentLateEval) -> int:
-        if isinstance(state, FragmentLateEval):
-            state = self._fragments[state.name]
+        if complexity <= self._max_complexity:
+            self._charge_budget(complexity)
+            return
 
-        children_complexity = sum(
-            self._resolve_complexity(c) for c in state.children
+        extensions: dict[str, Any] = {
+            "current": complexity,
+            "max": self._max_complexity,
+            "lowerBound": lower_bound,
+        }
+        if variables:
+            extensions["variables"] = variables
+        at_least = "at least " if lower_bound else ""
+        self.report_error(
+            GraphQLError(
+                f"Complexity of {at_least}{complexity} is greater than max complexity of {self._max_complexity}",
+                extensions={"complexity": extensions},
+            ),
         )
 
-        return self._calculate_complexity(
-            state=state,
-            children_complexity=children_complexity,
+    def _add_to_lower_bound(self, complexity: int) -> VisitorAction:
+        self._lower_bound = min(
+            self._lower_bound + complexity,
+            self.extension.complexity_ceiling,
         )
+        if self._lower_bound <= self._max_complexity:
+            return None
+        operation = self._selected_operation
+        if operation is not None and operation.variable_definitions:
+            # The whole plan is needed to solve the variable values that
+            # fit, as it would be if it were cached
+            return None
+
+        self._check_complexity(self._lower_bound, lower_bound=True)
+        self._release_flight(None)
+        return self.BREAK
 
-    def enter_document(self, node: DocumentNode, *args: object) -> None:
+    def enter_document(
+        self,
+        node: DocumentNode,
+        *args: object,
+    ) -> VisitorAction:
         if self.extension is None:
             # Issue a warning?
             return self.BREAK  # type: ignore[unreachable]
-        self._enter(State(), contributes_to_cost=False)
+        self._max_complexity = self.extension.get_max_complexity()
+
+        trusted = self.extension.trusted_documents
+        program = (
+            trusted.lookup(self._get_key_prefix(), self._hash_document(node))
+            if trusted is not None
+            else None
+        )
+        if program is not None:
+            # Trusted documents are planned with all of their operations
+            self._select_operations(node, plan_all=True)
+            self._report_complexity(program)
+            return self.BREAK
+
+        list_sizes = self.extension.list_sizes
+        if list_sizes is not None:
+            self._learned = list_sizes.get_learned_sizes()
+        self._plan_key = self._get_plan_key(node)
+        self._select_operations(node)
+        program = self.extension.plan_cache.get(self._plan_key)
+        if program is None:
+            program = self._join_flight()
+        if program is not None:
+            self._report_complexity(program)
+            return self.BREAK
+
+        # Only needed to build the plan, hits don't walk the document
+        self._select_fragments()
+        self._program = CostProgramBuilder(
+            default_cost=self.extension.default_complexity,
+            ceiling=self.extension.complexity_ceiling,
+        )
         return None
 
     def leave_document(self, node: DocumentNode, *args: object) -> None:
-        state = self._leave()
-        assert not self._state  # noqa: S101
-        complexity = self._resolve_complexity(state)
-        _complexity_var.set(
-            ComplexityResult(
-                current=complexity,
-                max=self.extension.max_complexity,
-            ),
+        assert self._program is not None  # noqa: S101
+        program = self._program.build(
+            fragment_order=_sort_fragments(self._fragment_dependencies),
         )
+        self.extension.plan_cache.set(self._plan_key, program)
+        self._release_flight(program)
+        self._report_complexity(program)
 
-        if complexity > self.extension.max_complexity:
-            self.report_error(
-                GraphQLError(
-                    f"Complexity of {complexity} is greater than max complexity of {self.extension.max_complexity}",
-                    extensions={
-                        "complexity": {
-                            "current": complexity,
-                            "max": self.extension.max_complexity,
-                        },
-                    },
-                ),
+    def _join_flight(self) -> CostProgram | None:
+        """Wait for a concurrent computation of the plan, or lead one."""
+        flights = self.extension.plan_cache.flights
+        flight, leader = flights.acquire(self._plan_key)
+        if not leader:
+            return flights.wait(flight)
+
+        self._flight = flight
+        # Waiters are released even if the walk doesn't finish
+        weakref.finalize(self, flights.release, self._plan_key, flight)
+        return None
+
+    def _release_flight(self, program: CostProgram | None) -> None:
+        if self._flight is not None:
+            self.extension.plan_cache.flights.release(
+                self._plan_key,
+                self._flight,
+                program,
             )
+            self._flight = None
 
-    def enter_field(  # noqa: C901
+    def enter_operation_definition(
         self,
-        node: FieldNode,
+        node: OperationDefinitionNode,
         *args: object,
     ) -> VisitorAction:
-        field_name = node.name.value
-        if field_name.startswith("__"):
-            return self.SKIP
-
-        if (parent_type := self.context.get_parent_type()) is None:
+        if not (
+            self.extension.report_operation_costs or self._is_counted(node)
+        ):
             return self.SKIP
 
-        if isinstance(parent_type, GraphQLUnionType):
+        self.program.enter_operation()
+        variables = self._coerce_variables(node)
+        if variables is None or not self._is_counted(node):
+            # Cost can't be bounded without variables, operations that
+            # are only reported don't count towards the bound.
+            self._scales.append(0)
             return None
 
-        if field_name not in parent_type.fields:
-            return None
+        self._variables = variables
+        self._scales.append(1)
+        return self._add_to_lower_bound(self.extension.default_complexity)
 
-        if isinstance(parent_type, GraphQLInterfaceType):
-            definitions = [
-                obj.fields[field_name]
-                for obj in self.context.schema.get_implementations(
-                    parent_type,
-                ).objects
-            ]
-        else:
-            definitions = [parent_type.fields[field_name]]
+    def leave_operation_definition(self, *args: object) -> None:
+        self.program.leave_operation()
+        self._scales.pop()
 
-        directives = [
-            _get_cost_directive(self.context.schema, def_)
-            for def_ in definitions
-        ]
-        resolves_to_type_cost = _get_cost_directive(
-            self.context.schema,
-            self.context.get_type(),
-        )
+    def enter_field(
+        self,
+        node: FieldNode,
+        *args: object,
+    ) -> VisitorAction:
+        field_name = node.name.value
+        parent_type = self.context.get_parent_type()
+        if (
+            field_name.startswith("__")
+            or parent_type is None
+            or isinstance(parent_type, GraphQLUnionType)
+            or field_name not in parent_type.fields
+        ):
+            return self.SKIP
 
-        cost = max(directives, key=default_cost_compare_key)
+        field = parent_type.fields[field_name]
+        cost = self._get_field_cost(parent_type, field_name)
+        return_type_name = get_named_type(field.type).name
+        multipliers = _get_multipliers(field, node, cost)
 
-        state = State(directive=cost)
-        result = _add_field_variables_to_state(
-            self.operation_definition,
-            type_def=self.context.get_field_def(),  # type: ignore[arg-type]
-            execution_context=self.execution_context,
-            node=node,
-            state=state,
-            cost=cost,
+        # Type cost only counts towards list items
+        type_cost = self._index.types.get(return_type_name)
+        item_cost = (
+            _get_unset_value(type_cost.complexity, 0)
+            if isinstance(cost, ListCost) and isinstance(type_cost, Cost)
+            else 0
         )
-        if result is not None:
-            return result
-
-        if resolves_to_type_cost and not isinstance(
-            resolves_to_type_cost,
-            ListCost,
+        self.program.enter_field(cost, multipliers, item_cost)
+        action = self._add_field_to_lower_bound(cost, multipliers, item_cost)
+        if (
+            self.extension.default_complexity == 0
+            and return_type_name not in self._index.costly_types
         ):
-            state.added_complexity += _get_unset_value(
-                resolves_to_type_cost.complexity,
-                0,
+            # Nothing below this field can add to its cost
+            self.leave_field(node)
+            return self.BREAK if action is self.BREAK else self.SKIP
+        return action
+
+    def _get_field_cost(
+        self,
+        parent_type: GraphQLObjectType | GraphQLInterfaceType,
+        field_name: str,
+    ) -> AnyCostDirective | None:
+        cost = self._index.fields.get((parent_type.name, field_name))
+        learned = self._learned
+        if learned is None or not isinstance(cost, ListCost):
+            return cost
+        if isinstance(parent_type, GraphQLObjectType):
+            return learned.get_directive((parent_type.name, field_name), cost)
+
+        # Sizes are learned for objects, interface fields cost as much as
+        # the costliest implementation, like their declared costs
+        directives = []
+        for obj in self.context.schema.get_possible_types(parent_type):
+            own = self._index.fields.get((obj.name, field_name))
+            directives.append(
+                (
+                    learned.get_directive((obj.name, field_name), own)
+                    if isinstance(own, ListCost)
+                    else own
+                ),
             )
-        self._enter(state)
-        return None
+        return _max_cost(directives)
+
+    def _add_field_to_lower_bound(
+        self,
+        cost: AnyCostDirective | None,
+        multipliers: Sequence[int | Variable],
+        item_cost: int,
+    ) -> VisitorAction:
+        parent_scale = self._scales[-1]
+        if not isinstance(cost, ListCost):
+            self._scales.append(parent_scale)
+            return self._add_to_lower_bound(
+                get_own_cost(cost, self.extension.default_complexity)
+                * parent_scale,
+            )
+
+        size = _get_list_size(
+            cost,
+            multipliers,
+            self._variables,
+            self.extension.complexity_ceiling,
+        )
+        scale = min(parent_scale * size, self.extension.complexity_ceiling)
+        self._scales.append(scale)
+        return self._add_to_lower_bound(item_cost * scale)
 
     def leave_field(self, node: FieldNode, *args: object) -> None:
-        self._leave()
+        self.program.leave_field()
+        self._scales.pop()
 
     def enter_fragment_definition(
         self,
         node: FragmentDefinitionNode,
         *_args: object,
-    ) -> None:
-        state = State()
-        self._fragments[node.name.value] = state
-        self._enter(state, contributes_to_cost=False)
+    ) -> VisitorAction:
+        if (
+            self._planned_fragments is not None
+            and node.name.value not in self._planned_fragments
+        ):
+            return self.SKIP
+
+        self._current_fragment = node.name.value
+        self._fragment_dependencies[node.name.value] = []
+        self.program.enter_fragment()
+        # Fragments are only counted where they are spread
+        self._scales.append(0)
+        return None
 
     def leave_fragment_definition(
         self,
         node: FragmentDefinitionNode,
         *_args: object,
     ) -> None:
-        self._leave()
+        self._current_fragment = None
+        self.program.leave_fragment(node.name.value)
+        self._scales.pop()
 
     def enter_fragment_spread(
         self,
@@ -345,6 +1113,69 @@ class QueryComplexityValidationRule(ValidationRule):
         if not fragment:
             return
 
-        self._state[-1].children.append(
-            FragmentLateEval(name=fragment.name.value),
+        self.program.spread(fragment.name.value)
+        if self._current_fragment is not None:
+            self._fragment_dependencies[self._current_fragment].append(
+                fragment.name.value,
+            )
+
+
+class _DocumentCompiler(QueryComplexityValidationRule):
+    """Build the program of every operation of a document, with no request."""
+
+    compiled: CostProgram | None = None
+
+    def enter_document(
+        self,
+        node: DocumentNode,
+        *args: object,
+    ) -> VisitorAction:
+        # Plans hold the whole cost, whatever the max of a request is
+        self._max_complexity = self.extension.complexity_ceiling
+        self._planned_operations = [
+            definition
+            for definition in node.definitions
+            if isinstance(definition, OperationDefinitionNode)
+        ]
+        self._program = CostProgramBuilder(
+            default_cost=self.extension.default_complexity,
+            ceiling=self.extension.complexity_ceiling,
         )
+        return None
+
+    def leave_document(self, node: DocumentNode, *args: object) -> None:
+        self.compiled = self.program.build(
+            fragment_order=_sort_fragments(self._fragment_dependencies),
+        )
+
+    def _coerce_variables(
+        self,
+        operation: OperationDefinitionNode,
+    ) -> dict[str, Any] | None:
+        # No variables to bound the cost with
+        return None
+
+
+def compile_document(
+    schema: GraphQLSchema,
+    document: DocumentNode,
+) -> CostProgram:
+    """
+    Build the cost program of every operation of `document`.
+
+    `document` should be valid, `schema` must use `QueryComplexityExtension`.
+    """
+    if _find_extension(schema) is None:
+        msg = "Schema doesn't use QueryComplexityExtension"
+        raise ValueError(msg)
+
+    def on_error(error: GraphQLError) -> None:
+        raise error
+
+    type_info = TypeInfo(schema)
+    compiler = _DocumentCompiler(
+        ValidationContext(schema, document, type_info, on_error),
+    )
+    visit(document, TypeInfoVisitor(type_info, compiler))
+    assert compiler.compiled is not None  # noqa: S101
+    return compiler.compiled
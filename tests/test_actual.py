@@ -0,0 +1,149 @@
+import asyncio
+
+import strawberry
+from graphql import graphql_sync
+from strawberry import Schema
+from strawberry_query_complexity import ListCost, QueryComplexityExtension
+
+from tests.test_complexity import Author, Book, Magazine, Press
+
+QUERY = "query { %s(count: 500) { title authors { name } } }"
+# (Book + title + assumed authors * (Author + name)) * assumed books
+ESTIMATE = (1 + 1 + 2 * (1 + 1)) * 10
+# (Book + title + one author * (Author + name)) * books resolved
+ACTUAL = (1 + 1 + 1 * (1 + 1)) * 500
+
+
+def _books(count: int) -> list[Book]:
+    return [
+        Book(
+            id=strawberry.ID(str(i)),
+            title="",
+            authors=[Author(id=strawberry.ID(str(i)), name="")],
+        )
+        for i in range(count)
+    ]
+
+
+@strawberry.type
+class Query:
+    @strawberry.field(directives=[ListCost(assumed_size=10)])  # type: ignore[misc]
+    def books(self, count: int) -> list[Book]:
+        return _books(count)
+
+    @strawberry.field(directives=[ListCost(assumed_size=10)])  # type: ignore[misc]
+    def press(self, count: int) -> list[Press | None]:
+        magazines = [
+            Magazine(id=strawberry.ID(str(i)), title="") for i in range(count)
+        ]
+        return [*_books(1), *magazines, None]
+
+    @strawberry.field
+    def book(self, count: int) -> Book | None:
+        return next(iter(_books(count)), None)
+
+    @strawberry.field(directives=[ListCost(assumed_size=10)])  # type: ignore[misc]
+    async def async_books(self, count: int) -> list[Book]:
+        return _books(count)
+
+    @strawberry.field(directives=[ListCost(assumed_size=10)])  # type: ignore[misc]
+    async def slow_books(self, count: int) -> list[Book]:
+        await asyncio.sleep(0.01)
+        return _books(count)
+
+
+def _schema(*, report_actual_cost: bool = True) -> Schema:
+    return Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=1000,
+                report_complexity=True,
+                report_actual_cost=report_actual_cost,
+            ),
+        ],
+        types=[Magazine],
+    )
+
+
+def test_actual_cost_is_reported() -> None:
+    result = _schema().execute_sync(QUERY % "books")
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == ESTIMATE
+    assert result.extensions["complexity"]["actual"] == ACTUAL
+
+
+def test_actual_cost_of_async_resolvers() -> None:
+    result = asyncio.run(_schema().execute(QUERY % "asyncBooks"))
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"]["actual"] == ACTUAL
+
+
+def test_actual_cost_of_concurrent_operations() -> None:
+    schema = _schema()
+
+    async def run() -> None:
+        first = asyncio.create_task(schema.execute(QUERY % "slowBooks"))
+        await asyncio.sleep(0)
+        second = await schema.execute("query { slowBooks(count: 2) { title } }")
+        assert second.extensions
+        assert second.extensions["complexity"]["actual"] == 2 * (1 + 1)
+
+        result = await first
+        assert result.extensions
+        assert result.extensions["complexity"]["actual"] == ACTUAL
+
+    asyncio.run(run())
+
+
+def test_actual_cost_is_opt_in() -> None:
+    result = _schema(report_actual_cost=False).execute_sync(QUERY % "books")
+    assert result.extensions
+    assert "actual" not in result.extensions["complexity"]
+
+
+def test_fragments_and_single_objects() -> None:
+    result = _schema().execute_sync(
+        """
+        query {
+          books(count: 3) { ...BookFields }
+          book(count: 1) { ... on Book { title } }
+          missing: book(count: 0) { title }
+        }
+        fragment BookFields on Book { ... { title } }
+        """,
+    )
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"]["actual"] == 3 * (1 + 1) + 1
+
+
+def test_fragments_only_count_objects_of_their_type() -> None:
+    result = _schema().execute_sync(
+        """
+        query {
+          press(count: 3) {
+            ... on Book { title }
+            ...MagazineFields
+          }
+        }
+        fragment MagazineFields on Magazine { title }
+        """,
+    )
+    assert not result.errors
+    assert result.extensions
+    # Five items counted by length, one Book and three Magazine titles
+    assert result.extensions["complexity"]["actual"] == 5 * 1 + 1 + 3 * 2
+
+
+def test_instrumented_schema_outside_of_extension() -> None:
+    schema = _schema()
+    schema.execute_sync(QUERY % "books")
+
+    result = graphql_sync(
+        schema._schema,  # noqa: SLF001
+        "{ book(count: 1) { title } }",
+    )
+    assert result.data == {"book": {"title": ""}}
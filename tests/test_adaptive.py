@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from strawberry import Schema
+from strawberry_query_complexity import (
+    AdaptiveComplexityLimit,
+    QueryComplexityExtension,
+)
+
+from tests.conftest import Clock
+from tests.test_complexity import Magazine, Query
+
+
+def test_limit_follows_in_flight_operations(clock: Clock) -> None:
+    limit = AdaptiveComplexityLimit(max_in_flight=2, min_scale=0.2, clock=clock)
+    for _ in range(3):
+        limit.enter()
+    assert limit.get_max_complexity(100) == 100  # noqa: PLR2004
+
+    maxes = []
+    for _ in range(4):
+        clock.now += 1
+        maxes.append(limit.get_max_complexity(100))
+    assert maxes == [50, 25, 20, 20]
+
+    for _ in range(3):
+        limit.leave()
+    clock.now += 1
+    assert limit.get_max_complexity(100) == 30  # noqa: PLR2004
+
+
+def test_limit_holds_between_thresholds(clock: Clock) -> None:
+    pressure = 2.0
+    limit = AdaptiveComplexityLimit(
+        cpu_pressure=lambda: pressure,
+        clock=clock,
+    )
+    clock.now += 1
+    assert limit.get_max_complexity(100) == 50  # noqa: PLR2004
+
+    pressure = 0.8
+    clock.now += 1
+    assert limit.get_max_complexity(100) == 50  # noqa: PLR2004
+
+
+def test_limit_follows_event_loop_lag(clock: Clock) -> None:
+    limit = AdaptiveComplexityLimit(max_loop_lag=0.1, clock=clock)
+
+    async def run() -> None:
+        clock.now += 1
+        limit.get_max_complexity(100)
+        clock.now += 0.5
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert limit.loop_lag == 0.5  # noqa: PLR2004
+    clock.now += 1
+    assert limit.get_max_complexity(100) == 50  # noqa: PLR2004
+
+
+def test_min_scale_must_be_a_fraction() -> None:
+    with pytest.raises(ValueError, match="min_scale"):
+        AdaptiveComplexityLimit(min_scale=0)
+
+
+def test_effective_max_complexity_is_reported() -> None:
+    limit = AdaptiveComplexityLimit(cpu_pressure=lambda: 2.0, interval=0)
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=40,
+                report_complexity=True,
+                adaptive_limit=limit,
+            ),
+        ],
+        types=[Magazine],
+    )
+
+    result = schema.execute_sync("query { books { title } }")
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"]["max"] == 20  # noqa: PLR2004
+
+    result = schema.execute_sync("query { books { title } }")
+    assert result.errors
+    assert result.errors[0].extensions == {
+        "complexity": {"current": 20, "max": 10, "lowerBound": False},
+    }
+    assert limit.in_flight == 0
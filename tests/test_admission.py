@@ -0,0 +1,53 @@
+from strawberry import Schema
+from strawberry_query_complexity import QueryComplexityExtension
+
+from tests.test_complexity import Magazine, Query
+from tests.test_list import VARIABLE_ARGUMENTS
+
+MAX_COMPLEXITY = 10_000
+
+
+REJECTION = {
+    "complexity": {
+        "current": 15_000,
+        "max": MAX_COMPLEXITY,
+        "lowerBound": False,
+        "variables": {"input": MAX_COMPLEXITY // 3},
+    },
+}
+
+
+def _schema() -> Schema:
+    return Schema(
+        query=Query,
+        extensions=[QueryComplexityExtension(max_complexity=MAX_COMPLEXITY)],
+        types=[Magazine],
+    )
+
+
+def test_rejection_reports_largest_variable_value() -> None:
+    schema = _schema()
+    result = schema.execute_sync(
+        VARIABLE_ARGUMENTS,
+        variable_values={"input": 10},
+    )
+    assert not result.errors
+
+    result = schema.execute_sync(
+        VARIABLE_ARGUMENTS,
+        variable_values={"input": 5000},
+    )
+    assert result.errors
+    assert result.errors[0].extensions == REJECTION
+
+
+def test_first_rejection_reports_largest_variable_value() -> None:
+    schema = _schema()
+    # The lower bound is exceeded before the plan is cached
+    for _ in range(2):
+        result = schema.execute_sync(
+            VARIABLE_ARGUMENTS,
+            variable_values={"input": 5000},
+        )
+        assert result.errors
+        assert result.errors[0].extensions == REJECTION
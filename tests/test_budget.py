@@ -0,0 +1,106 @@
+import math
+
+import pytest
+from strawberry import Schema
+from strawberry.types import ExecutionContext
+from strawberry_query_complexity import (
+    QueryComplexityExtension,
+    TokenBucketBudget,
+)
+
+from tests.conftest import Clock
+from tests.test_complexity import Magazine, Query
+
+QUERY = "query { books { title } }"
+QUERY_COST = 20
+
+
+def _client_key(execution_context: ExecutionContext) -> str | None:
+    return (execution_context.variables or {}).get("client")
+
+
+@pytest.fixture
+def budget(clock: Clock) -> TokenBucketBudget:
+    return TokenBucketBudget(capacity=50, refill_rate=10, clock=clock)
+
+
+@pytest.fixture
+def schema(budget: TokenBucketBudget) -> Schema:
+    extension = QueryComplexityExtension(
+        max_complexity=1000,
+        budget=budget,
+        client_key=_client_key,
+    )
+    return Schema(query=Query, extensions=[extension], types=[Magazine])
+
+
+def test_budget_is_charged_per_client(schema: Schema, clock: Clock) -> None:
+    for _ in range(2):
+        assert not schema.execute_sync(QUERY, {"client": "a"}).errors
+
+    result = schema.execute_sync(QUERY, {"client": "a"})
+    assert result.errors
+    assert result.errors[0].extensions == {
+        "budget": {"cost": QUERY_COST, "retryAfter": 1.0},
+    }
+    assert not schema.execute_sync(QUERY, {"client": "b"}).errors
+    assert not schema.execute_sync(QUERY).errors
+
+    clock.now = 1.0
+    assert not schema.execute_sync(QUERY, {"client": "a"}).errors
+
+
+def test_cost_over_capacity_is_never_admitted(
+    budget: TokenBucketBudget,
+) -> None:
+    assert budget.charge("a", 51) == math.inf
+
+
+def test_refund_restores_tokens(budget: TokenBucketBudget) -> None:
+    budget.charge("a", 50)
+    budget.refund("a", 20)
+    budget.refund("b", 20)
+    assert budget.charge("a", 20) is None
+    assert budget.charge("a", 1) is not None
+    assert len(budget) == 1
+
+
+def test_idle_buckets_are_evicted(clock: Clock) -> None:
+    budget = TokenBucketBudget(
+        capacity=50,
+        refill_rate=10,
+        max_clients=2,
+        clock=clock,
+    )
+    budget.charge("a", 50)
+    budget.charge("b", 50)
+    budget.charge("c", 50)
+    assert len(budget) == 2  # noqa: PLR2004
+
+    clock.now = 5.0
+    budget.charge("d", 10)
+    assert len(budget) == 1
+
+
+def test_clients_at_capacity_are_not_evicted_when_charged(
+    clock: Clock,
+) -> None:
+    budget = TokenBucketBudget(
+        capacity=50,
+        refill_rate=10,
+        max_clients=2,
+        clock=clock,
+    )
+    assert budget.charge("a", 50) is None
+    assert budget.charge("b", 50) is None
+    for client in ("a", "b", "a", "b"):
+        assert budget.charge(client, 20) is not None
+    assert len(budget) == 2  # noqa: PLR2004
+
+
+def test_client_key_is_required() -> None:
+    with pytest.raises(ValueError, match="client_key"):
+        QueryComplexityExtension(
+            max_complexity=1000,
+            budget=TokenBucketBudget(capacity=1, refill_rate=1),
+        )
@@ -0,0 +1,160 @@
+import threading
+import time
+
+import pytest
+from graphql import (
+    FragmentDefinitionNode,
+    OperationDefinitionNode,
+    ValidationContext,
+)
+from strawberry import Schema
+from strawberry_query_complexity import QueryComplexityExtension
+from strawberry_query_complexity._cache import SingleFlight
+from strawberry_query_complexity._validation import (
+    CostProgram,
+    CostProgramBuilder,
+)
+
+from tests.test_complexity import Magazine, Query
+from tests.test_list import VARIABLE_ARGUMENTS
+
+
+@pytest.fixture
+def extension() -> QueryComplexityExtension:
+    return QueryComplexityExtension(
+        max_complexity=10_000,
+        report_complexity=True,
+    )
+
+
+@pytest.fixture
+def schema(extension: QueryComplexityExtension) -> Schema:
+    return Schema(query=Query, extensions=[extension], types=[Magazine])
+
+
+def test_plan_is_reused_with_new_variables(
+    schema: Schema,
+    extension: QueryComplexityExtension,
+) -> None:
+    for limit in (10, 100, 1000):
+        result = schema.execute_sync(
+            VARIABLE_ARGUMENTS,
+            variable_values={"input": limit},
+        )
+        assert result.extensions
+        assert result.extensions["complexity"]["current"] == limit * 3
+
+    assert extension.plan_cache.misses == 1
+    assert extension.plan_cache.hits == 2  # noqa: PLR2004
+
+
+def test_plan_hit_does_not_walk_fragments(
+    schema: Schema,
+    extension: QueryComplexityExtension,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    walks: list[str] = []
+    walk = ValidationContext.get_recursively_referenced_fragments
+
+    def counted_walk(
+        self: ValidationContext,
+        operation: OperationDefinitionNode,
+    ) -> list[FragmentDefinitionNode]:
+        walks.append(operation.name.value if operation.name else "")
+        return walk(self, operation)
+
+    monkeypatch.setattr(
+        ValidationContext,
+        "get_recursively_referenced_fragments",
+        counted_walk,
+    )
+    query = "query Books { books { ...BookFields } } fragment BookFields on Book { title }"
+    counts = []
+    for _ in range(2):
+        walks.clear()
+        result = schema.execute_sync(query)
+        assert not result.errors
+        counts.append(len(walks))
+
+    assert extension.plan_cache.hits == 1
+    # Other validation rules walk them too, the plan only on a miss
+    assert counts[0] == counts[1] + 1
+
+
+def test_plan_cache_is_bounded() -> None:
+    extension = QueryComplexityExtension(
+        max_complexity=10_000,
+        plan_cache_size=1,
+    )
+    schema = Schema(query=Query, extensions=[extension], types=[Magazine])
+
+    schema.execute_sync("query { books { id } }")
+    schema.execute_sync("query { press { title } }")
+    schema.execute_sync("query { books { id } }")
+
+    assert len(extension.plan_cache) == 1
+    assert extension.plan_cache.hits == 0
+    assert extension.plan_cache.misses == 3  # noqa: PLR2004
+
+
+def test_concurrent_misses_are_coalesced(
+    schema: Schema,
+    extension: QueryComplexityExtension,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    release = threading.Event()
+    build = CostProgramBuilder.build
+
+    def _build(
+        self: CostProgramBuilder,
+        fragment_order: list[str],
+    ) -> CostProgram:
+        release.wait(timeout=5)
+        return build(self, fragment_order)
+
+    monkeypatch.setattr(CostProgramBuilder, "build", _build)
+    costs: list[int] = []
+
+    def _execute() -> None:
+        result = schema.execute_sync("query { books { title } }")
+        assert result.extensions
+        costs.append(result.extensions["complexity"]["current"])
+
+    threads = [threading.Thread(target=_execute) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    flights = extension.plan_cache.flights
+    deadline = time.monotonic() + 5
+    while flights.joined < len(threads) - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert costs == [20] * len(threads)
+    assert flights.deduplicated == len(threads) - 1
+    assert len(flights) == 0
+
+
+def test_abandoned_flight_releases_waiters() -> None:
+    flights = SingleFlight()
+    flight, leader = flights.acquire("key")
+    assert leader
+    waiting, leader = flights.acquire("key")
+    assert waiting is flight
+    assert not leader
+
+    flights.release("key", flight)
+    assert flights.wait(waiting) is None
+    assert flights.deduplicated == 0
+    assert len(flights) == 0
+
+
+def test_flight_can_be_released_while_the_lock_is_held() -> None:
+    flights = SingleFlight()
+    flight, _ = flights.acquire("key")
+
+    # As a finalizer collected while acquiring another key would
+    with flights._lock:  # noqa: SLF001
+        flights.release("key", flight)
+    assert len(flights) == 0
@@ -1,4 +1,5 @@
 from collections.abc import Sequence
+from typing import Annotated
 
 import strawberry
 from strawberry import Schema
@@ -34,6 +35,9 @@ class Magazine(Press):
     title: str = strawberry.field(directives=[Cost(complexity=2)])
 
 
+Publication = Annotated[Book | Magazine, strawberry.union("Publication")]
+
+
 @strawberry.type
 class Query:
     @strawberry.field(
@@ -60,6 +64,13 @@ class Query:
     ) -> Sequence[Press]:
         return []
 
+    @strawberry.field(directives=[ListCost(assumed_size=BOOKS_ASSUMED_SIZE, arguments=["limit"])])  # type: ignore[misc]
+    def publications(
+        self,
+        limit: int | None = None,  # noqa: ARG002
+    ) -> Sequence[Publication]:
+        return []
+
 
 schema = Schema(
     query=Query,
@@ -85,5 +96,23 @@ def test_field_exceeds_max_complexity() -> None:
         "complexity": {
             "max": MAX_COMPLEXITY,
             "current": MAX_COMPLEXITY + 1,
+            "lowerBound": True,
+        },
+    }
+
+
+def test_traversal_stops_once_lower_bound_exceeds_max() -> None:
+    extension = QueryComplexityExtension(max_complexity=MAX_COMPLEXITY)
+    schema = Schema(query=Query, extensions=[extension], types=[Magazine])
+    query = "query { " + " ".join(f"ok{i}: ok" for i in range(1000)) + " }"
+
+    result = schema.execute_sync(query=query)
+    assert result.errors
+    assert result.errors[0].extensions == {
+        "complexity": {
+            "max": MAX_COMPLEXITY,
+            "current": MAX_COMPLEXITY * 2,
+            "lowerBound": True,
         },
     }
+    assert len(extension.plan_cache) == 0
@@ -0,0 +1,219 @@
+import asyncio
+
+import pytest
+from strawberry import Schema
+from strawberry.types import ExecutionContext
+from strawberry_query_complexity import (
+    CostConcurrencyExtension,
+    CostSemaphore,
+    FairCostSemaphore,
+    QueryComplexityExtension,
+)
+
+from tests.test_complexity import Magazine, Query
+
+QUERY = "query { books { title } }"
+QUERY_COST = 20
+
+
+SEMAPHORES = [CostSemaphore, FairCostSemaphore]
+
+
+async def _admit(
+    semaphore: CostSemaphore,
+    cost: int,
+    order: list[int],
+    client: str = "",
+) -> None:
+    assert await semaphore.acquire(cost, client=client)
+    order.append(cost)
+
+
+def test_operations_wait_in_order() -> None:
+    async def run() -> list[int]:
+        semaphore = CostSemaphore(10)
+        order: list[int] = []
+        assert await semaphore.acquire(8)
+        tasks = [
+            asyncio.create_task(_admit(semaphore, cost, order))
+            for cost in (5, 1, 100)
+        ]
+        await asyncio.sleep(0)
+        assert order == []
+        assert semaphore.waiting == 3  # noqa: PLR2004
+
+        semaphore.release(8)
+        await asyncio.sleep(0)
+        semaphore.release(5)
+        semaphore.release(1)
+        await asyncio.gather(*tasks)
+        assert semaphore.in_flight == 10  # noqa: PLR2004
+        return order
+
+    assert asyncio.run(run()) == [5, 1, 100]
+
+
+@pytest.mark.parametrize("semaphore_class", SEMAPHORES)
+def test_waiting_is_bounded(semaphore_class: type[CostSemaphore]) -> None:
+    async def run() -> None:
+        semaphore = semaphore_class(10, max_waiting=1)
+        assert await semaphore.acquire(10)
+        waiting = asyncio.create_task(semaphore.acquire(1, timeout=0.01))
+        await asyncio.sleep(0)
+        assert not await semaphore.acquire(1)
+        assert not await waiting
+        assert semaphore.waiting == 0
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("semaphore_class", SEMAPHORES)
+def test_cancelled_waiter_is_removed(
+    semaphore_class: type[CostSemaphore],
+) -> None:
+    async def run() -> None:
+        semaphore = semaphore_class(10)
+        assert await semaphore.acquire(10)
+        first = asyncio.create_task(semaphore.acquire(5))
+        second = asyncio.create_task(semaphore.acquire(5))
+        await asyncio.sleep(0)
+        first.cancel()
+        semaphore.release(10)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second
+        assert semaphore.in_flight == 5  # noqa: PLR2004
+
+    asyncio.run(run())
+
+
+def test_admission_racing_timeout_is_released() -> None:
+    async def run() -> None:
+        semaphore = CostSemaphore(10)
+        assert await semaphore.acquire(10)
+        waiter = asyncio.create_task(semaphore.acquire(5))
+        await asyncio.sleep(0)
+        semaphore.release(10)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert semaphore.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_clients_share_capacity_fairly() -> None:
+    async def run() -> list[int]:
+        semaphore = FairCostSemaphore(10)
+        order: list[int] = []
+        assert await semaphore.acquire(10)
+        tasks = [
+            asyncio.create_task(_admit(semaphore, cost, order, client))
+            for cost, client in [(10, "a"), (10, "a"), (1, "b"), (2, "b")]
+        ]
+        await asyncio.sleep(0)
+        assert semaphore.waiting == 4  # noqa: PLR2004
+
+        semaphore.release(10)
+        await asyncio.sleep(0)
+        assert order == [1, 2]
+        semaphore.release(1)
+        semaphore.release(2)
+        await asyncio.sleep(0)
+        semaphore.release(10)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == [1, 2, 10, 10]
+
+
+def test_capacity_must_be_positive() -> None:
+    with pytest.raises(ValueError, match="capacity"):
+        CostSemaphore(0)
+    with pytest.raises(ValueError, match="quantum"):
+        FairCostSemaphore(10, quantum=0)
+
+
+def test_extension_rejects_operations_over_capacity() -> None:
+    concurrency = CostConcurrencyExtension(
+        capacity=QUERY_COST,
+        max_waiting=0,
+    )
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(max_complexity=1000),
+            concurrency,
+        ],
+        types=[Magazine],
+    )
+
+    async def run() -> None:
+        result = await schema.execute(QUERY)
+        assert not result.errors
+        assert concurrency.semaphore.in_flight == 0
+
+        assert await concurrency.semaphore.acquire(1)
+        result = await schema.execute(QUERY)
+        assert result.errors
+        assert result.errors[0].extensions == {
+            "complexity": {"current": QUERY_COST, "inFlight": 1},
+        }
+
+    asyncio.run(run())
+
+
+def test_extension_schedules_clients_fairly() -> None:
+    def client_key(execution_context: ExecutionContext) -> str | None:
+        return (execution_context.variables or {}).get("client")
+
+    concurrency = CostConcurrencyExtension(
+        capacity=QUERY_COST,
+        client_key=client_key,
+    )
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(max_complexity=1000),
+            concurrency,
+        ],
+        types=[Magazine],
+    )
+    assert isinstance(concurrency.semaphore, FairCostSemaphore)
+
+    async def run() -> None:
+        for variables in ({"client": "a"}, None):
+            result = await schema.execute(QUERY, variable_values=variables)
+            assert not result.errors
+        assert concurrency.semaphore.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_extension_rejects_the_operation_that_timed_out() -> None:
+    concurrency = CostConcurrencyExtension(capacity=QUERY_COST, timeout=0.05)
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(max_complexity=1000),
+            concurrency,
+        ],
+        types=[Magazine],
+    )
+
+    async def run() -> None:
+        assert await concurrency.semaphore.acquire(QUERY_COST)
+        waiting = asyncio.create_task(schema.execute(QUERY))
+        await asyncio.sleep(0.01)
+        # Another request starts while the first one waits
+        other = await schema.execute("query {")
+        assert other.errors
+        assert "Too many operations" not in other.errors[0].message
+
+        result = await waiting
+        assert result.errors
+        assert result.errors[0].message.startswith("Too many operations")
+        assert result.data is None
+        assert concurrency.semaphore.in_flight == QUERY_COST
+
+    asyncio.run(run())
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import strawberry
+from strawberry import Schema
+from strawberry_query_complexity import (
+    Cost,
+    CostDeadlineExtension,
+    QueryComplexityExtension,
+)
+
+DEADLINE_ERROR = {"complexity": {"deadlineMs": 100}}
+
+
+@strawberry.type
+class Query:
+    @strawberry.field(directives=[Cost(complexity=100)])  # type: ignore[misc]
+    async def slow(self) -> str | None:
+        await asyncio.sleep(10)
+        return "slow"
+
+    @strawberry.field
+    async def fast(self) -> str:
+        return "fast"
+
+    @strawberry.field(directives=[Cost(complexity=50)])  # type: ignore[misc]
+    def blocking(self) -> str | None:
+        time.sleep(0.11)
+        return "blocking"
+
+
+schema = Schema(
+    query=Query,
+    extensions=[
+        QueryComplexityExtension(max_complexity=1000),
+        CostDeadlineExtension(base_ms=0, ms_per_cost=1),
+    ],
+)
+
+
+def test_timeout_follows_complexity() -> None:
+    extension = CostDeadlineExtension(base_ms=10, ms_per_cost=2, max_ms=100)
+    assert extension.get_timeout_ms(5) == 20  # noqa: PLR2004
+    assert extension.get_timeout_ms(1000) == 100  # noqa: PLR2004
+
+    extension = CostDeadlineExtension(model=lambda complexity: complexity / 2)
+    assert extension.get_timeout_ms(5) == 2.5  # noqa: PLR2004
+
+
+def test_pending_resolvers_are_cancelled() -> None:
+    started = time.monotonic()
+    result = asyncio.run(schema.execute("query { fast slow }"))
+
+    assert time.monotonic() - started < 1
+    assert result.data == {"fast": "fast", "slow": None}
+    assert result.errors
+    assert result.errors[0].path == ["slow"]
+    assert result.errors[0].extensions == DEADLINE_ERROR
+
+
+def test_no_resolvers_run_after_deadline() -> None:
+    result = schema.execute_sync("query { blocking other: blocking }")
+
+    assert result.data == {"blocking": "blocking", "other": None}
+    assert result.errors
+    assert result.errors[0].extensions == DEADLINE_ERROR
+
+
+def test_operations_within_deadline_succeed() -> None:
+    result = schema.execute_sync("query { blocking }")
+    assert not result.errors
+
+
+def test_free_operations_have_no_deadline() -> None:
+    # `fast` costs nothing, its timeout of 0 ms means no deadline
+    result = asyncio.run(schema.execute("query { fast }"))
+    assert not result.errors
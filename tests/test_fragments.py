@@ -0,0 +1,53 @@
+import pytest
+from strawberry import Schema
+from strawberry_query_complexity import QueryComplexityExtension
+
+from tests.test_complexity import BOOKS_ASSUMED_SIZE, Magazine, Query
+
+
+def _fan_out_document(depth: int) -> str:
+    fragments = [
+        f"fragment F{i} on Book {{ title ...F{i + 1} ...F{i + 1} }}"
+        for i in range(depth)
+    ]
+    fragments.append(f"fragment F{depth} on Book {{ title }}")
+    return "query { books { ...F0 } }\n" + "\n".join(fragments)
+
+
+@pytest.fixture
+def schema() -> Schema:
+    return Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=2**62,
+                report_complexity=True,
+            ),
+        ],
+        types=[Magazine],
+    )
+
+
+@pytest.mark.parametrize("depth", [1, 5, 40])
+def test_fragment_fan_out(schema: Schema, depth: int) -> None:
+    result = schema.execute_sync(_fan_out_document(depth))
+
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == (
+        2 ** (depth + 1) * BOOKS_ASSUMED_SIZE
+    )
+
+
+def test_fragment_cycle(schema: Schema) -> None:
+    query = """query {
+      books { ...A }
+    }
+    fragment A on Book { title ...B }
+    fragment B on Book { ...A }
+    """
+    result = schema.execute_sync(query)
+
+    assert result.errors
+    assert result.errors[0].message == (
+        "Cannot spread fragment 'A' within itself via 'B'."
+    )
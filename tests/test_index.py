@@ -0,0 +1,44 @@
+from strawberry_query_complexity import Cost, ListCost
+from strawberry_query_complexity._index import get_cost_index
+
+from tests.test_complexity import BOOKS_ASSUMED_SIZE, schema
+
+graphql_schema = schema._schema  # noqa: SLF001
+
+
+def test_index_is_built_once() -> None:
+    assert get_cost_index(graphql_schema) is get_cost_index(graphql_schema)
+
+
+def test_index_contents() -> None:
+    index = get_cost_index(graphql_schema)
+
+    assert index.types["Book"] == Cost(complexity=1)
+    assert index.fields["Book", "title"] == Cost(complexity=1)
+    assert index.fields["Query", "books"] == ListCost(
+        assumed_size=BOOKS_ASSUMED_SIZE,
+        arguments=["limit"],
+    )
+    assert ("Book", "id") not in index.fields
+    assert "Query" not in index.types
+
+
+def test_index_resolves_abstract_types() -> None:
+    index = get_cost_index(graphql_schema)
+
+    assert index.fields["Press", "title"] == Cost(complexity=2)
+    assert index.types["Press"] == Cost(complexity=1)
+    assert index.types["Publication"] == Cost(complexity=1)
+
+
+def test_index_costly_types() -> None:
+    index = get_cost_index(graphql_schema)
+
+    assert {
+        "Query",
+        "Book",
+        "Author",
+        "Magazine",
+        "Press",
+    } <= index.costly_types
+    assert "String" not in index.costly_types
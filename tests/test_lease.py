@@ -0,0 +1,126 @@
+import asyncio
+import math
+from collections.abc import Mapping
+
+import pytest
+from strawberry_query_complexity import (
+    LeasedBudget,
+    LocalBudgetStore,
+    QueryComplexityExtension,
+    TokenBucketBudget,
+)
+
+from tests.conftest import Clock
+
+
+class FailingStore:
+    async def reserve(
+        self,
+        amounts: Mapping[str, int],  # noqa: ARG002
+    ) -> Mapping[str, float | None]:
+        raise ConnectionError
+
+    async def refund(self, amounts: Mapping[str, float]) -> None:
+        raise NotImplementedError
+
+
+@pytest.fixture
+def store(clock: Clock) -> TokenBucketBudget:
+    return TokenBucketBudget(capacity=100, refill_rate=1, clock=clock)
+
+
+@pytest.fixture
+def budget(store: TokenBucketBudget, clock: Clock) -> LeasedBudget:
+    return LeasedBudget(
+        LocalBudgetStore(store),
+        lease_size=40,
+        idle_timeout=60,
+        clock=clock,
+    )
+
+
+def test_charges_are_spent_from_leases(
+    budget: LeasedBudget,
+    clock: Clock,
+) -> None:
+    assert budget.charge("a", 30) is None
+    assert budget.charge("a", 20) == budget.flush_interval
+
+    asyncio.run(budget.flush())
+    assert budget.charge("a", 10) is None
+    asyncio.run(budget.flush())
+    assert budget.charge("a", 40) is None
+    asyncio.run(budget.flush())
+    assert budget.charge("a", 1) == 20.0  # noqa: PLR2004
+    clock.now += 20
+    assert budget.charge("a", 1) is None
+    assert budget.charge("a", 41) == math.inf
+
+
+def test_idle_leases_are_refunded(
+    budget: LeasedBudget,
+    store: TokenBucketBudget,
+    clock: Clock,
+) -> None:
+    budget.charge("a", 10)
+    asyncio.run(budget.flush())
+    asyncio.run(budget.flush())
+    assert store.charge("a", 61) is not None
+
+    clock.now += 60
+    asyncio.run(budget.flush())
+    assert len(budget) == 0
+    assert store.charge("a", 90) is None
+
+
+def test_failed_flush_is_retried(
+    caplog: pytest.LogCaptureFixture,
+    clock: Clock,
+) -> None:
+    budget = LeasedBudget(FailingStore(), lease_size=40, clock=clock)
+    budget.charge("a", 10)
+
+    async def run() -> None:
+        task = asyncio.create_task(budget.run())
+        await asyncio.sleep(budget.flush_interval * 1.5)
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(caplog.records) == 2  # noqa: PLR2004
+    assert budget.charge("a", 30) is None
+
+
+def test_lease_size_must_be_positive(store: TokenBucketBudget) -> None:
+    with pytest.raises(ValueError, match="lease_size"):
+        LeasedBudget(LocalBudgetStore(store), lease_size=0)
+
+
+def test_leases_are_renewed_in_the_background(
+    store: TokenBucketBudget,
+) -> None:
+    budget = LeasedBudget(
+        LocalBudgetStore(store),
+        lease_size=40,
+        flush_interval=0.01,
+    )
+
+    async def run() -> None:
+        assert budget.charge("a", 30) is None
+        await asyncio.sleep(0.05)
+        # The first lease paid the debt off and the next one is taken
+        assert budget.charge("a", 40) is None
+        assert budget.charge("a", 40) is None
+
+    asyncio.run(run())
+    assert store.charge("a", 21) is not None
+
+
+def test_lease_size_must_cover_max_complexity(
+    budget: LeasedBudget,
+) -> None:
+    with pytest.raises(ValueError, match="lease_size"):
+        QueryComplexityExtension(
+            max_complexity=budget.lease_size + 1,
+            budget=budget,
+            client_key=lambda _: "client",
+        )
@@ -0,0 +1,124 @@
+import math
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from strawberry_query_complexity import (
+    SharedTokenBucketBudget,
+    SQLiteTokenBucketBudget,
+)
+from strawberry_query_complexity._budget import CostBudget
+
+from tests.conftest import Clock
+
+
+@pytest.fixture
+def clock() -> Clock:
+    # Slots charged at time 0 would look unused
+    return Clock(now=1000.0)
+
+
+BudgetFactory = Callable[[Path, Clock], CostBudget]
+
+
+def _shared(path: Path, clock: Clock) -> CostBudget:
+    return SharedTokenBucketBudget(
+        path,
+        capacity=50,
+        refill_rate=10,
+        slots=64,
+        clock=clock,
+    )
+
+
+def _sqlite(path: Path, clock: Clock) -> CostBudget:
+    return SQLiteTokenBucketBudget(
+        path,
+        capacity=50,
+        refill_rate=10,
+        clock=clock,
+    )
+
+
+@pytest.mark.parametrize("factory", [_shared, _sqlite])
+def test_budget_is_shared_through_file(
+    tmp_path: Path,
+    clock: Clock,
+    factory: BudgetFactory,
+) -> None:
+    first = factory(tmp_path / "budget", clock)
+    second = factory(tmp_path / "budget", clock)
+
+    assert first.charge("a", 30) is None
+    assert second.charge("a", 30) == 1.0
+    assert second.charge("b", 30) is None
+    assert first.charge("a", 51) == math.inf
+
+    clock.now += 1
+    assert second.charge("a", 30) is None
+    assert first.charge("a", 1) == pytest.approx(0.1)
+
+
+def test_shared_budget_reuses_oldest_slot(
+    tmp_path: Path,
+    clock: Clock,
+) -> None:
+    budget = SharedTokenBucketBudget(
+        tmp_path / "budget",
+        capacity=50,
+        refill_rate=10,
+        slots=1,
+        clock=clock,
+    )
+    assert budget.charge("a", 50) is None
+    assert budget.charge("b", 50) is None
+    assert len(budget) == 1
+    budget.close()
+
+
+def test_shared_budget_layout_mismatch(tmp_path: Path) -> None:
+    path = tmp_path / "budget"
+    SharedTokenBucketBudget(path, capacity=1, refill_rate=1, slots=8).close()
+
+    with pytest.raises(ValueError, match="same layout"):
+        SharedTokenBucketBudget(path, capacity=1, refill_rate=1, slots=16)
+    with pytest.raises(ValueError, match="slots"):
+        SharedTokenBucketBudget(path, capacity=1, refill_rate=1, slots=0)
+
+
+def test_sqlite_budget_deletes_full_buckets(
+    tmp_path: Path,
+    clock: Clock,
+) -> None:
+    budget = SQLiteTokenBucketBudget(
+        tmp_path / "budget",
+        capacity=50,
+        refill_rate=10,
+        cleanup_interval=2,
+        clock=clock,
+    )
+    budget.charge("a", 10)
+    clock.now += 6
+    budget.charge("b", 10)
+    assert len(budget) == 1
+    budget.close()
+
+
+def test_sqlite_budget_rolls_back_failed_charge(tmp_path: Path) -> None:
+    def clock() -> float:
+        raise RuntimeError
+
+    budget = SQLiteTokenBucketBudget(
+        tmp_path / "budget",
+        capacity=50,
+        refill_rate=10,
+        clock=clock,
+    )
+    with pytest.raises(RuntimeError):
+        budget.charge("a", 10)
+    assert len(budget) == 0
+
+
+def test_bucket_parameters_must_be_positive(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="positive"):
+        SQLiteTokenBucketBudget(tmp_path / "budget", capacity=0, refill_rate=1)
@@ -1,8 +1,11 @@
+from collections.abc import Collection
 from typing import Any
 
 import pytest
+from graphql import GraphQLSchema, VariableDefinitionNode, get_variable_values
+from graphql.execution.values import CoercedVariableValues
 from strawberry import Schema
-from strawberry_query_complexity import QueryComplexityExtension
+from strawberry_query_complexity import QueryComplexityExtension, _validation
 
 from tests.test_complexity import (
     BOOKS_ASSUMED_SIZE,
@@ -80,6 +83,15 @@ _UNION_SPREAD_MAGAZINE = """query  {
 }
 """
 
+_UNION_TYPE_SPREAD_MAGAZINE = """query  {
+  publications {
+    ... on Magazine {
+      title
+    }
+  }
+}
+"""
+
 
 @pytest.mark.parametrize(
     ("query", "cost"),
@@ -105,6 +117,10 @@ _UNION_SPREAD_MAGAZINE = """query  {
             _UNION_SPREAD_MAGAZINE,
             BOOKS_ASSUMED_SIZE * 3,
         ),
+        (
+            _UNION_TYPE_SPREAD_MAGAZINE,
+            BOOKS_ASSUMED_SIZE * 3,
+        ),
     ],
 )
 def test_list_cost(query: str, cost: int) -> None:
@@ -184,3 +200,45 @@ def test_variables(query: str, variables: dict[str, Any], cost: int) -> None:
         "max": 10_000,
         "current": cost,
     }
+
+
+def test_variables_are_coerced_once_per_operation(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = 0
+
+    def _get_variable_values(
+        schema: GraphQLSchema,
+        var_def_nodes: Collection[VariableDefinitionNode],
+        inputs: dict[str, Any],
+    ) -> CoercedVariableValues:
+        nonlocal calls
+        calls += 1
+        return get_variable_values(schema, var_def_nodes, inputs)
+
+    monkeypatch.setattr(
+        _validation,
+        "get_variable_values",
+        _get_variable_values,
+    )
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=10_000,
+                report_complexity=True,
+            ),
+        ],
+        types=[Magazine],
+    )
+    query = """query ($limit: Int!) {
+      first: books(limit: $limit) { id }
+      second: books(limit: $limit) { id }
+      third: press(limit: $limit) { title }
+    }"""
+
+    for request in range(1, 3):
+        result = schema.execute_sync(query, variable_values={"limit": 1})
+        assert result.extensions
+        assert result.extensions["complexity"]["current"] == 5  # noqa: PLR2004
+        assert calls == request
@@ -0,0 +1,75 @@
+import pytest
+import strawberry
+from strawberry import Schema
+from strawberry_query_complexity import Cost, ListCost, QueryComplexityExtension
+
+NODE_ASSUMED_SIZE = 2
+
+
+@strawberry.type
+class Node:
+    @strawberry.field(directives=[Cost(complexity=1)])  # type: ignore[misc]
+    def value(self) -> int:
+        return 0
+
+    @strawberry.field(directives=[ListCost(assumed_size=NODE_ASSUMED_SIZE, arguments=["limit"])])  # type: ignore[misc]
+    def children(
+        self,
+        limit: int | None = None,  # noqa: ARG002
+    ) -> list["Node"]:
+        return []
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    def root(self) -> Node:
+        return Node()
+
+
+def _nested_query(depth: int) -> str:
+    return (
+        "query ($limit: Int) { root { "
+        + "children(limit: $limit) { value " * depth
+        + "}" * depth
+        + " } }"
+    )
+
+
+def _expected_cost(depth: int, limit: int) -> int:
+    cost = 0
+    for _ in range(depth):
+        cost = (cost + 1) * limit
+    return cost
+
+
+@pytest.mark.parametrize(
+    ("variables", "limit"),
+    [
+        ({"limit": 3}, 3),
+        ({}, NODE_ASSUMED_SIZE),
+    ],
+)
+def test_deeply_nested_query(variables: dict[str, int], limit: int) -> None:
+    depth = 200
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=2**400,
+                report_complexity=True,
+            ),
+        ],
+    )
+
+    result = schema.execute_sync(
+        _nested_query(depth),
+        variable_values=variables,
+    )
+
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == _expected_cost(
+        depth,
+        limit,
+    )
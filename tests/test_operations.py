@@ -0,0 +1,88 @@
+import pytest
+from strawberry import Schema
+from strawberry_query_complexity import QueryComplexityExtension
+
+from tests.test_complexity import (
+    BOOKS_ASSUMED_SIZE,
+    MAX_COMPLEXITY,
+    Magazine,
+    Query,
+)
+
+_OPERATIONS = """query Cheap {
+  books {
+    ...CheapBook
+  }
+}
+
+query Expensive {
+  books(limit: 1000) {
+    ...ExpensiveBook
+  }
+}
+
+fragment CheapBook on Book {
+  id
+}
+
+fragment ExpensiveBook on Book {
+  title
+  authors {
+    name
+  }
+}"""
+
+_CHEAP_COST = BOOKS_ASSUMED_SIZE
+_EXPENSIVE_COST = 6000
+
+
+def _schema(*, report_operation_costs: bool = False) -> Schema:
+    return Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=MAX_COMPLEXITY,
+                report_complexity=True,
+                report_operation_costs=report_operation_costs,
+            ),
+        ],
+        types=[Magazine],
+    )
+
+
+def test_only_executed_operation_is_costed() -> None:
+    result = _schema().execute_sync(_OPERATIONS, operation_name="Cheap")
+
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"] == {
+        "current": _CHEAP_COST,
+        "max": MAX_COMPLEXITY,
+    }
+
+
+def test_executed_operation_exceeds_max_complexity() -> None:
+    result = _schema().execute_sync(_OPERATIONS, operation_name="Expensive")
+
+    assert result.errors
+    assert result.errors[0].extensions
+    assert result.errors[0].extensions["complexity"]["lowerBound"] is True
+
+
+@pytest.mark.parametrize("requests", [1, 2])
+def test_report_operation_costs(requests: int) -> None:
+    schema = _schema(report_operation_costs=True)
+
+    for _ in range(requests):
+        result = schema.execute_sync(_OPERATIONS, operation_name="Cheap")
+
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"] == {
+        "current": _CHEAP_COST,
+        "max": MAX_COMPLEXITY,
+        "operations": {
+            "Cheap": _CHEAP_COST,
+            "Expensive": _EXPENSIVE_COST,
+        },
+    }
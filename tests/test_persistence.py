@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+from strawberry import Schema
+from strawberry_query_complexity import QueryComplexityExtension
+
+from tests.test_complexity import Magazine, Query
+from tests.test_list import VARIABLE_ARGUMENTS
+
+
+def _make_schema(extension: QueryComplexityExtension) -> Schema:
+    return Schema(query=Query, extensions=[extension], types=[Magazine])
+
+
+def test_plans_are_loaded_after_restart(tmp_path: Path) -> None:
+    path = tmp_path / "plans.bin"
+    extension = QueryComplexityExtension(max_complexity=10_000)
+    _make_schema(extension).execute_sync(
+        VARIABLE_ARGUMENTS,
+        variable_values={"input": 10},
+    )
+    assert extension.dump_plans(path) == 1
+
+    restarted = QueryComplexityExtension(
+        max_complexity=10_000,
+        report_complexity=True,
+    )
+    schema = _make_schema(restarted)
+    assert restarted.load_plans(path, schema) == 1
+
+    result = schema.execute_sync(
+        VARIABLE_ARGUMENTS,
+        variable_values={"input": 100},
+    )
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == 300  # noqa: PLR2004
+    assert restarted.plan_cache.hits == 1
+    assert restarted.plan_cache.misses == 0
+
+
+def test_plans_of_other_settings_are_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "plans.bin"
+    extension = QueryComplexityExtension(max_complexity=10_000)
+    _make_schema(extension).execute_sync("query { books { id } }")
+    extension.dump_plans(path)
+
+    other = QueryComplexityExtension(max_complexity=10_000, default_cost=1)
+    assert other.load_plans(path, _make_schema(other)) == 0
+    assert len(other.plan_cache) == 0
+
+
+def test_invalid_file(tmp_path: Path) -> None:
+    path = tmp_path / "plans.bin"
+    path.write_bytes(b"not plans")
+    extension = QueryComplexityExtension(max_complexity=10_000)
+
+    with pytest.raises(ValueError, match="not a cost plans file"):
+        extension.load_plans(path, _make_schema(extension))
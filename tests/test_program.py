@@ -0,0 +1,73 @@
+from strawberry_query_complexity import Cost, ListCost
+from strawberry_query_complexity._validation import (
+    ADD,
+    LIST,
+    SPREAD,
+    CostProgramBuilder,
+    Variable,
+)
+
+CEILING = 2**63 - 1
+
+
+def test_constant_selections_are_folded() -> None:
+    builder = CostProgramBuilder(default_cost=1, ceiling=CEILING)
+    builder.enter_operation()
+    builder.enter_field(ListCost(assumed_size=10), [], item_cost=1)
+    builder.enter_field(Cost(complexity=2), [], item_cost=0)
+    builder.leave_field()
+    builder.leave_field()
+    builder.leave_operation()
+    program = builder.build(fragment_order=[])
+
+    assert len(program.kinds) == 1
+    assert program.evaluate(0, {}) == 1 + (1 + 2) * 10
+
+
+def test_variables_and_fragments_are_evaluated() -> None:
+    items = ListCost(assumed_size=10, arguments=["first"])
+    builder = CostProgramBuilder(default_cost=0, ceiling=CEILING)
+    builder.enter_fragment()
+    builder.enter_field(Cost(complexity=3), [], item_cost=0)
+    builder.leave_field()
+    builder.leave_fragment("ItemFragment")
+    builder.enter_operation()
+    builder.enter_field(items, [Variable("first")], item_cost=1)
+    builder.spread("ItemFragment")
+    builder.leave_field()
+    builder.enter_field(items, [Variable("first")], item_cost=1)
+    builder.leave_field()
+    builder.leave_operation()
+    program = builder.build(fragment_order=["ItemFragment"])
+
+    assert list(program.kinds[program.operations[0][0] :]) == [
+        ADD,
+        LIST,
+        SPREAD,
+        LIST,
+    ]
+    assert len(program.list_sizes) == 1
+    assert program.evaluate(0, {"first": 5}) == (1 + 3) * 5 + 5
+    assert program.evaluate(0, {}) == (1 + 3) * 10 + 10
+
+
+def test_admission_is_solved_for_variables() -> None:
+    items = ListCost(assumed_size=10, arguments=["first"])
+    inner = ListCost(assumed_size=10, arguments=["inner"])
+    builder = CostProgramBuilder(default_cost=0, ceiling=CEILING)
+    builder.enter_operation()
+    builder.enter_field(items, [Variable("first")], item_cost=0)
+    builder.enter_field(inner, [Variable("inner")], item_cost=1)
+    builder.leave_field()
+    builder.leave_field()
+    builder.leave_operation()
+    program = builder.build(fragment_order=[])
+
+    assert program.admissions[0] is not None
+    assert program.admissions[0].terms == {(0, 1): 1}
+    variables = {"first": 10, "inner": 30}
+    assert program.evaluate(0, variables) == 300  # noqa: PLR2004
+    assert program.solve_variables(0, variables, 66) == {
+        "first": 2,
+        "inner": 6,
+    }
@@ -0,0 +1,68 @@
+from collections.abc import Sequence
+
+import strawberry
+from strawberry import Schema
+from strawberry_query_complexity import Cost, ListCost, QueryComplexityExtension
+from strawberry_query_complexity._index import get_cost_index
+
+ASSUMED_SIZE = 5
+
+
+@strawberry.type
+class Tag:
+    id: strawberry.ID
+    name: str
+
+
+@strawberry.type
+class Post:
+    id: strawberry.ID
+    tags: Sequence[Tag]
+    related: Sequence["Post"]
+
+
+@strawberry.type
+class Product:
+    id: strawberry.ID
+    price: int = strawberry.field(directives=[Cost(complexity=3)])
+
+
+@strawberry.type
+class Query:
+    @strawberry.field(directives=[ListCost(assumed_size=ASSUMED_SIZE)])  # type: ignore[misc]
+    def posts(self) -> Sequence[Post]:
+        return []
+
+    @strawberry.field(directives=[ListCost(assumed_size=ASSUMED_SIZE)])  # type: ignore[misc]
+    def products(self) -> Sequence[Product]:
+        return []
+
+
+schema = Schema(
+    query=Query,
+    extensions=[
+        QueryComplexityExtension(max_complexity=100, report_complexity=True),
+    ],
+)
+
+
+def test_free_types_are_not_costly() -> None:
+    index = get_cost_index(schema._schema)  # noqa: SLF001
+
+    assert index.costly_types == {"Query", "Product"}
+
+
+def test_free_subtrees_are_pruned() -> None:
+    query = """
+    query {
+        posts { id tags { name } related { ...PostFragment } }
+        products { id price }
+    }
+
+    fragment PostFragment on Post { related { id } }
+    """
+    result = schema.execute_sync(query)
+
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == 3 * ASSUMED_SIZE
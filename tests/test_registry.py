@@ -0,0 +1,146 @@
+import hashlib
+import runpy
+import sys
+from pathlib import Path
+
+import pytest
+from strawberry import Schema
+from strawberry_query_complexity import (
+    QueryComplexityExtension,
+    TrustedDocuments,
+)
+from strawberry_query_complexity._cli import main
+
+from tests.test_complexity import Magazine, Query, schema
+
+DOCUMENT = """
+query Books($limit: Int) { books(limit: $limit) { title } }
+query Press { press { title } }
+"""
+
+
+@pytest.fixture
+def registry() -> TrustedDocuments:
+    return TrustedDocuments()
+
+
+@pytest.fixture
+def extension(registry: TrustedDocuments) -> QueryComplexityExtension:
+    return QueryComplexityExtension(
+        max_complexity=10_000,
+        report_complexity=True,
+        trusted_documents=registry,
+    )
+
+
+@pytest.fixture
+def trusted_schema(extension: QueryComplexityExtension) -> Schema:
+    return Schema(query=Query, extensions=[extension], types=[Magazine])
+
+
+@pytest.mark.parametrize(
+    ("operation_name", "cost"),
+    [
+        ("Books", 10),
+        ("Press", 30),
+    ],
+)
+def test_trusted_documents_are_not_analysed(
+    registry: TrustedDocuments,
+    extension: QueryComplexityExtension,
+    trusted_schema: Schema,
+    operation_name: str,
+    cost: int,
+) -> None:
+    document_id = registry.add(trusted_schema, DOCUMENT)
+    assert document_id == hashlib.sha256(DOCUMENT.encode()).hexdigest()
+
+    result = trusted_schema.execute_sync(
+        DOCUMENT,
+        variable_values={"limit": 5},
+        operation_name=operation_name,
+    )
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == cost
+    assert extension.plan_cache.misses == 0
+
+
+def test_invalid_document(
+    registry: TrustedDocuments,
+    trusted_schema: Schema,
+) -> None:
+    with pytest.raises(ValueError, match="Invalid document"):
+        registry.add(trusted_schema, "query { unknown }")
+
+
+def test_cli_builds_registry(tmp_path: Path) -> None:
+    documents = tmp_path / "documents"
+    (documents / "nested").mkdir(parents=True)
+    (documents / "books.graphql").write_text(DOCUMENT)
+    (documents / "nested" / "ok.graphql").write_text("query { ok }")
+    output = tmp_path / "registry.bin"
+
+    assert (
+        main(
+            [
+                "tests.test_complexity:schema",
+                str(documents),
+                "--output",
+                str(output),
+            ],
+        )
+        == 0
+    )
+
+    registry = TrustedDocuments()
+    assert registry.load(schema, output) == 2  # noqa: PLR2004
+    document_id = hashlib.sha256(DOCUMENT.encode()).hexdigest()
+    assert registry.get(schema, document_id) is not None
+
+
+@pytest.mark.parametrize(
+    ("schema_path", "document", "error"),
+    [
+        ("tests.missing:schema", "query { ok }", "No module named"),
+        ("tests.test_complexity:Query", "query { ok }", "not a strawberry"),
+        ("tests.test_complexity", "query { unknown }", "Invalid document"),
+    ],
+)
+def test_cli_reports_errors(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    schema_path: str,
+    document: str,
+    error: str,
+) -> None:
+    (tmp_path / "document.graphql").write_text(document)
+
+    with pytest.raises(SystemExit) as exc_info:
+        main([schema_path, str(tmp_path), "-o", str(tmp_path / "out.bin")])
+    assert exc_info.value.code == 2  # noqa: PLR2004
+    assert error in capsys.readouterr().err
+    assert not (tmp_path / "out.bin").exists()
+
+
+def test_cli_runs_as_module(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    (tmp_path / "ok.graphql").write_text("query { ok }")
+    output = tmp_path / "registry.bin"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "strawberry_query_complexity",
+            "tests.test_complexity",
+            str(tmp_path),
+            "-o",
+            str(output),
+        ],
+    )
+
+    with pytest.raises(SystemExit) as exc_info:
+        runpy.run_module("strawberry_query_complexity", run_name="__main__")
+    assert exc_info.value.code == 0
+    assert TrustedDocuments().load(schema, output) == 1
@@ -0,0 +1,94 @@
+from collections.abc import Sequence
+
+import pytest
+import strawberry
+from strawberry import Schema
+from strawberry_query_complexity import Cost, ListCost, QueryComplexityExtension
+
+from tests.test_complexity import MAX_COMPLEXITY, Magazine
+from tests.test_complexity import Query as BooksQuery
+
+ITEMS_MAX_SIZE = 50
+CEILING = 1000
+
+
+@strawberry.type
+class Item:
+    @strawberry.field(directives=[Cost(complexity=1)])  # type: ignore[misc]
+    def value(self) -> int:
+        return 0
+
+
+@strawberry.type
+class Query:
+    @strawberry.field(directives=[ListCost(assumed_size=2, arguments=["first", "last"], max_size=ITEMS_MAX_SIZE)])  # type: ignore[misc]
+    def items(
+        self,
+        first: int | None = None,  # noqa: ARG002
+        last: int | None = None,  # noqa: ARG002
+    ) -> Sequence[Item]:
+        return []
+
+
+def test_complexity_saturates_at_ceiling() -> None:
+    schema = Schema(
+        query=BooksQuery,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=MAX_COMPLEXITY,
+                complexity_ceiling=CEILING,
+            ),
+        ],
+        types=[Magazine],
+    )
+    query = """query {
+      books(limit: 2000000000) {
+        authors {
+          name
+        }
+      }
+    }"""
+
+    result = schema.execute_sync(query)
+    assert result.errors
+    assert result.errors[0].extensions == {
+        "complexity": {
+            "current": CEILING,
+            "max": MAX_COMPLEXITY,
+            "lowerBound": True,
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    ("arguments", "cost"),
+    [
+        ("first: 2000000000, last: 10", ITEMS_MAX_SIZE + 10),
+        ("first: -10", 0),
+        ("", 2),
+    ],
+)
+def test_list_size_is_clamped(arguments: str, cost: int) -> None:
+    schema = Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=MAX_COMPLEXITY,
+                report_complexity=True,
+            ),
+        ],
+    )
+    selection = f"items({arguments})" if arguments else "items"
+
+    result = schema.execute_sync(f"query {{ {selection} {{ value }} }}")
+    assert not result.errors
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == cost
+
+
+def test_ceiling_must_exceed_max_complexity() -> None:
+    with pytest.raises(ValueError, match="complexity_ceiling"):
+        QueryComplexityExtension(
+            max_complexity=MAX_COMPLEXITY,
+            complexity_ceiling=MAX_COMPLEXITY,
+        )
@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+from strawberry import Schema
+from strawberry_query_complexity import (
+    ListCost,
+    QueryComplexityExtension,
+    SharedPlanCache,
+)
+from strawberry_query_complexity._serialization import (
+    dump_program,
+    load_program,
+)
+from strawberry_query_complexity._validation import (
+    CostProgramBuilder,
+    Variable,
+)
+
+from tests.test_complexity import Magazine, Query
+from tests.test_list import VARIABLE_ARGUMENTS
+
+
+def _execute(cache: SharedPlanCache, limit: int) -> int:
+    extension = QueryComplexityExtension(
+        max_complexity=10_000,
+        report_complexity=True,
+        plan_cache=cache,
+    )
+    schema = Schema(query=Query, extensions=[extension], types=[Magazine])
+    result = schema.execute_sync(
+        VARIABLE_ARGUMENTS,
+        variable_values={"input": limit},
+    )
+    assert result.extensions
+    return result.extensions["complexity"]["current"]  # type: ignore[no-any-return]
+
+
+def test_plans_are_shared_through_file(tmp_path: Path) -> None:
+    path = tmp_path / "plans"
+    first = SharedPlanCache(path)
+    second = SharedPlanCache(path)
+
+    assert _execute(first, 10) == 30  # noqa: PLR2004
+    assert _execute(second, 100) == 300  # noqa: PLR2004
+    assert first.misses == 1
+    assert second.hits == 1
+    assert second.misses == 0
+    assert len(second) == 1
+
+
+def test_oldest_plan_is_evicted(tmp_path: Path) -> None:
+    path = tmp_path / "plans"
+    cache = SharedPlanCache(path, slots=1, local_size=0)
+    _execute(cache, 10)
+    _execute(cache, 10)
+    assert cache.hits == 1
+
+    cache.set("other", CostProgramBuilder(default_cost=0, ceiling=1).build([]))
+    _execute(cache, 10)
+    assert len(cache) == 1
+    assert cache.misses == 2  # noqa: PLR2004
+
+
+def test_layout_mismatch(tmp_path: Path) -> None:
+    path = tmp_path / "plans"
+    SharedPlanCache(path, slots=8).close()
+
+    with pytest.raises(ValueError, match="same layout"):
+        SharedPlanCache(path, slots=16)
+
+
+def test_program_round_trip() -> None:
+    builder = CostProgramBuilder(default_cost=1, ceiling=2**63 - 1)
+    builder.enter_operation()
+    builder.enter_field(
+        ListCost(assumed_size=10, arguments=["first"]),
+        [Variable("first")],
+        item_cost=1,
+    )
+    builder.spread("Fragment")
+    builder.leave_field()
+    builder.leave_operation()
+    program = builder.build(fragment_order=[])
+
+    assert load_program(dump_program(program)) == program
@@ -0,0 +1,262 @@
+import json
+from pathlib import Path
+
+import pytest
+import strawberry
+from strawberry import Schema
+from strawberry_query_complexity import (
+    ListCost,
+    ListSizeStats,
+    QuantileSketch,
+    QueryComplexityExtension,
+)
+
+from tests.conftest import Clock
+from tests.test_actual import ESTIMATE, QUERY, Query
+from tests.test_complexity import Book
+
+
+@strawberry.interface
+class Shelf:
+    books: list[Book] = strawberry.field(
+        directives=[ListCost(assumed_size=10)],
+    )
+
+
+@strawberry.type
+class Bookcase(Shelf):
+    pass
+
+
+@strawberry.type
+class ShelfQuery:
+    @strawberry.field
+    def shelf(self) -> Shelf:
+        return Bookcase(
+            books=[
+                Book(id=strawberry.ID(str(i)), title="", authors=[])
+                for i in range(3)
+            ],
+        )
+
+
+def _schema(list_sizes: ListSizeStats) -> Schema:
+    return Schema(
+        query=Query,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=1000,
+                report_complexity=True,
+                list_sizes=list_sizes,
+            ),
+        ],
+    )
+
+
+def test_sketch_quantiles_are_accurate() -> None:
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in range(1, 10_001):
+        sketch.add(value)
+
+    assert sketch.count == 10_000  # noqa: PLR2004
+    for q in (0.5, 0.95, 0.99):
+        estimate = sketch.quantile(q)
+        assert estimate is not None
+        assert estimate == pytest.approx(q * 10_000, rel=0.02)
+
+
+def test_sketch_zeroes() -> None:
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+
+    sketch.add(0, 3)
+    sketch.add(100)
+    assert sketch.quantile(0.5) == 0
+    assert sketch.quantile(1) == pytest.approx(100, rel=0.01)
+
+
+def test_sketch_memory_is_bounded() -> None:
+    sketch = QuantileSketch(relative_accuracy=0.01, max_bins=64)
+    for value in range(1, 100_000, 7):
+        sketch.add(value)
+
+    assert len(sketch.to_dict()["bins"]) == 64  # noqa: PLR2004
+    # Only the lowest values lose accuracy
+    assert sketch.quantile(0.99) == pytest.approx(99_000, rel=0.02)
+
+
+def test_sketch_merge_and_round_trip() -> None:
+    first = QuantileSketch(max_bins=8)
+    second = QuantileSketch(max_bins=8)
+    for value in range(1, 6):
+        first.add(value)
+        second.add(value * 1000)
+    first.merge(second)
+
+    assert first.count == 10  # noqa: PLR2004
+    assert len(first.to_dict()["bins"]) == 8  # noqa: PLR2004
+
+    loaded = QuantileSketch.from_dict(first.to_dict(), max_bins=4)
+    assert loaded.count == first.count
+    assert len(loaded.to_dict()["bins"]) == 4  # noqa: PLR2004
+    assert loaded.quantile(1) == first.quantile(1)
+
+
+def test_sketch_invalid() -> None:
+    with pytest.raises(ValueError, match="relative_accuracy"):
+        QuantileSketch(relative_accuracy=1)
+    with pytest.raises(ValueError, match="max_bins"):
+        QuantileSketch(max_bins=0)
+    with pytest.raises(ValueError, match="different accuracy"):
+        QuantileSketch().merge(QuantileSketch(relative_accuracy=0.05))
+    with pytest.raises(ValueError, match="Invalid sketch"):
+        QuantileSketch.from_dict({"relativeAccuracy": 0.01})
+
+
+def test_lengths_are_summarized() -> None:
+    stats = ListSizeStats()
+    schema = _schema(stats)
+    for count in (1, 10, 100):
+        result = schema.execute_sync(QUERY.replace("500", str(count)) % "books")
+        assert not result.errors
+
+    summary = stats.summary()
+    assert list(summary) == ["Book.authors", "Query.books"]
+    assert summary["Query.books"]["count"] == 3  # noqa: PLR2004
+    assert summary["Query.books"]["p50"] == pytest.approx(10, rel=0.01)
+    assert summary["Query.books"]["p99"] == pytest.approx(100, rel=0.01)
+    assert summary["Book.authors"]["count"] == 111  # noqa: PLR2004
+    assert stats.get_learned_sizes() is None
+
+
+def test_learned_sizes_are_used_once_there_are_enough(clock: Clock) -> None:
+    stats = ListSizeStats(
+        percentile=0.95,
+        min_samples=2,
+        refresh_interval=10,
+        clock=clock,
+    )
+    schema = _schema(stats)
+    query = QUERY.replace("500", "5") % "books"
+
+    result = schema.execute_sync(query)
+    assert result.extensions
+    assert result.extensions["complexity"]["current"] == ESTIMATE
+    schema.execute_sync(query)
+    # Sizes are only learned every `refresh_interval`
+    learned = stats.get_learned_sizes()
+    assert learned is not None
+    assert learned.sizes == {}
+
+    clock.now = 10
+    result = schema.execute_sync(query)
+    assert result.extensions
+    # (Book + title + one author * (Author + name)) * five books
+    assert result.extensions["complexity"]["current"] == 4 * 5
+    learned = stats.get_learned_sizes()
+    assert learned is not None
+    assert learned.sizes == {("Query", "books"): 5, ("Book", "authors"): 1}
+
+    directive = ListCost(assumed_size=10)
+    assert learned.get_directive(("Query", "books"), directive) is (
+        learned.get_directive(("Query", "books"), directive)
+    )
+    assert learned.get_directive(("Query", "book"), directive) is directive
+
+
+def test_learned_sizes_apply_to_interface_fields() -> None:
+    stats = ListSizeStats(percentile=0.5, min_samples=1, refresh_interval=0)
+    schema = Schema(
+        query=ShelfQuery,
+        extensions=[
+            QueryComplexityExtension(
+                max_complexity=1000,
+                report_complexity=True,
+                list_sizes=stats,
+            ),
+        ],
+        types=[Bookcase],
+    )
+    query = "query { shelf { books { title } } }"
+
+    costs = []
+    for _ in range(2):
+        result = schema.execute_sync(query)
+        assert result.extensions
+        costs.append(result.extensions["complexity"]["current"])
+
+    # Lengths are recorded for the object, the interface costs with them
+    assert stats.summary()["Bookcase.books"]["count"] == 2  # noqa: PLR2004
+    assert costs == [10 * (1 + 1), 3 * (1 + 1)]
+
+
+def test_learned_sizes_are_versioned() -> None:
+    stats = ListSizeStats(percentile=0.5, min_samples=1, refresh_interval=0)
+    initial = stats.get_learned_sizes()
+    assert initial is not None
+
+    stats.observe(("Query", "books"), 5)
+    learned = stats.get_learned_sizes()
+    assert learned is not None
+    assert learned.version != initial.version
+
+    stats.observe(("Query", "books"), 5)
+    assert stats.get_learned_sizes() is learned
+
+    restarted = ListSizeStats(percentile=0.5, min_samples=1)
+    restarted.observe(("Query", "books"), 5)
+    restarted.refresh()
+    assert restarted.get_learned_sizes() == learned
+
+
+def test_sizes_are_loaded_after_restart(tmp_path: Path) -> None:
+    path = tmp_path / "sizes.json"
+    stats = ListSizeStats()
+    for length in range(100):
+        stats.observe(("Query", "books"), length)
+    stats.observe(("Book", "authors"), 1)
+    stats.refresh()
+    assert stats.dump(path) == 2  # noqa: PLR2004
+
+    restarted = ListSizeStats(percentile=0.9, min_samples=100)
+    assert restarted.load(path) == 2  # noqa: PLR2004
+    assert restarted.summary() == stats.summary()
+    learned = restarted.get_learned_sizes()
+    assert learned is not None
+    assert learned.sizes == {("Query", "books"): 89}
+
+
+def test_empty_sketches_learn_nothing(tmp_path: Path) -> None:
+    path = tmp_path / "sizes.json"
+    sketch = QuantileSketch().to_dict()
+    path.write_text(
+        json.dumps({"version": 1, "fields": [["Query", "books", sketch]]}),
+    )
+
+    stats = ListSizeStats(percentile=0.5, min_samples=0)
+    assert stats.load(path) == 1
+    learned = stats.get_learned_sizes()
+    assert learned is not None
+    assert learned.sizes == {}
+
+
+def test_invalid_sizes(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="percentile"):
+        ListSizeStats(percentile=95)
+
+    path = tmp_path / "sizes.json"
+    path.write_text("not sizes")
+    with pytest.raises(ValueError, match="not a list sizes file"):
+        ListSizeStats().load(path)
+    path.write_text(json.dumps({"version": 0, "fields": []}))
+    with pytest.raises(ValueError, match="of this version"):
+        ListSizeStats().load(path)
+
+
+def test_failed_dump_leaves_no_file(tmp_path: Path) -> None:
+    path = tmp_path / "sizes"
+    (path / "taken").mkdir(parents=True)
+
+    with pytest.raises(OSError):  # noqa: PT011
+        ListSizeStats().dump(path)
+    assert [file.name for file in tmp_path.iterdir()] == ["sizes"]